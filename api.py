@@ -1,9 +1,17 @@
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, BackgroundTasks, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
 import logging
+import time
+from dataclasses import asdict
 from scan_hybrid import HybridBrain
 from src.simulation_engine import SimulationEngine
+from src.multi_portfolio import MultiPortfolioEngine, portfolio_grid
+from src.trade_records import render
+from src.scan_service import ScanService
+from src.replay import DecisionRecorder
+from src.encoding import FORMATS, negotiate_media, negotiate_encoding
+from src.metrics import METRICS
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
@@ -23,45 +31,136 @@ app.add_middleware(
 # Initialize Brain & Sim Engine
 brain = HybridBrain()
 sim_engine = SimulationEngine()
+# Parallel experiments: allocation x take-profit x stop-loss variants on the same ticks
+portfolios = MultiPortfolioEngine(portfolio_grid())
+
+def portfolio_view(portfolio: dict) -> dict:
+    """Engine state -> JSON for the dashboard (trade records rendered as log lines)."""
+    return dict(portfolio, history=[render(r) for r in portfolio['history']])
+
+# Scans run on a bar clock; /api/scan serves the latest snapshot.
+# Ticked decisions are recorded for offline replay (replay_simulation.py --recorded)
+scan_service = ScanService(brain, sim_engine, portfolio_view, portfolios=portfolios, recorder=DecisionRecorder())
+
+@app.middleware("http")
+async def time_requests(request: Request, call_next):
+    """Per-route latency into the stage histograms (stage="http <route>")."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    METRICS.observe_stage(f"http {route.path if route else 'unmatched'}", time.perf_counter() - start)
+    return response
+
+@app.on_event("startup")
+def start_scan_clock():
+    scan_service.start_clock()
+
+@app.on_event("shutdown")
+def stop_scan_clock():
+    scan_service.shutdown()
 
 @app.get("/")
-def home():
+async def home():
     return {"status": "Online", "message": "Sniper Agent is Ready."}
 
 @app.get("/api/scan")
-def run_scan():
+async def run_scan(request: Request, format: str = 'rows'):
     """
-    Triggers the Hybrid Brain to think.
-    automatically processes a simulation tick based on findings.
+    Latest Hybrid Brain snapshot (read-only).
+    Scans and simulation ticks happen on the bar clock (ScanService), not per request;
+    polls with a matching If-None-Match get a 304.
+    
+    format=columnar returns `data` as column arrays (and each History as Time/Close/Volume arrays).
+    Accept: application/msgpack and Accept-Encoding: br/gzip are honoured (encoded once per snapshot).
     """
-    logger.info("Received Scan Request from Dashboard...")
-    try:
-        decisions = brain.think()
-        
-        # RL Simulation Tick (Auto-Run)
-        logs = sim_engine.process_tick(decisions)
-        
-        # Sort by Confidence for the UI
-        decisions.sort(key=lambda x: x['Confidence'], reverse=True)
-        
-        return {
-            "status": "success", 
-            "data": decisions, 
-            "simulation": sim_engine.get_portfolio(),
-            "logs": logs
-        }
-    except Exception as e:
-        logger.error(f"Scan failed: {e}")
-        return {"status": "error", "message": str(e)}
+    snapshot = scan_service.snapshot
+    if snapshot is None:
+        scan_service.start_clock()
+        return {"status": "pending", "message": "First scan is still running."}
+    
+    if format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of {FORMATS}")
+    media_type = negotiate_media(request.headers.get("accept"))
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    body, etag = snapshot.encode(format, media_type, encoding)
+    
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept, Accept-Encoding"}
+    not_modified = request.headers.get("if-none-match") == etag
+    METRICS.cache('etag', not_modified)
+    if not_modified:
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+@app.post("/api/scan/jobs", status_code=202)
+async def create_scan_job(profile: bool = False):
+    """
+    Requests a fresh scan. Returns immediately; joins the running scan if there is one.
+    Poll GET /api/scan/jobs/{id}, then read /api/scan.
+    profile=true writes a profile of the scan (path in the finished job's `profile`).
+    """
+    return scan_service.submit(profile=profile).to_dict()
+
+@app.get("/api/scan/jobs/{job_id}")
+async def get_scan_job(job_id: str):
+    job = scan_service.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown scan job.")
+    return job.to_dict()
+
+@app.get("/metrics")
+async def metrics():
+    """Stage timings, per-ticker fetch latency and cache hit rates (Prometheus text format)."""
+    return Response(content=METRICS.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/api/simulation/state")
-def get_sim_state():
-    return sim_engine.get_portfolio()
+async def get_sim_state():
+    return portfolio_view(sim_engine.get_portfolio())
+
+@app.get("/api/simulation/history")
+def get_sim_history(cursor: int = None, limit: int = 50):
+    """
+    Pages through the full trade log, newest first.
+    Pass the returned next_cursor to get the next (older) page.
+    """
+    page = sim_engine.history_page(cursor=cursor, limit=max(1, min(limit, 500)))
+    items = [
+        {'id': item['id'], 'text': render(item['record']),
+         'trade': None if isinstance(item['record'], str) else asdict(item['record'])}
+        for item in page['items']
+    ]
+    return {'items': items, 'next_cursor': page['next_cursor']}
+
+@app.get("/api/simulation/analytics")
+def get_sim_analytics():
+    stats = sim_engine.analytics()
+    stats['exposure'] = {k: v.tolist() for k, v in stats['exposure'].items()}
+    return stats
 
 @app.post("/api/simulation/reset")
 def reset_sim():
     sim_engine.reset()
-    return {"status": "reset", "state": sim_engine.get_portfolio()}
+    if scan_service.snapshot is not None:
+        scan_service.publish() # Don't serve the pre-reset portfolio
+    return {"status": "reset", "state": portfolio_view(sim_engine.get_portfolio())}
+
+@app.get("/api/simulation/portfolios")
+def list_portfolios():
+    """Leaderboard of the experiment portfolios (best balance first)."""
+    return {"ticks": portfolios.ticks, "portfolios": portfolios.leaderboard()}
+
+@app.post("/api/simulation/portfolios/reset")
+def reset_portfolios():
+    portfolios.reset()
+    return {"status": "reset", "portfolios": portfolios.leaderboard()}
+
+# Keep this after the fixed /api/simulation/* routes so it doesn't shadow them
+@app.get("/api/simulation/{portfolio_id}")
+def get_portfolio(portfolio_id: str):
+    if portfolio_id not in portfolios.ids:
+        raise HTTPException(status_code=404, detail=f"Unknown portfolio '{portfolio_id}'.")
+    return portfolio_view(portfolios.get_portfolio(portfolio_id))
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
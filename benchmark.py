@@ -0,0 +1,235 @@
+import argparse
+import json
+import logging
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from src.data_loader import MVPDataLoader
+from src.panel import MarketPanel
+from src.simulation_engine import SimulationEngine
+from src.synthetic import SyntheticMarket, SyntheticIntradayLoader, ticker_names
+from scan_intraday import SniperEngine
+from scan_volatility import VolatilityEngine
+
+# Optional: the TDA benchmark needs gudhi
+try:
+    from src.tda_features import FeatureProcessor
+except ImportError:
+    FeatureProcessor = None
+
+logger = logging.getLogger('Benchmark')
+
+BASELINE_PATH = "benchmark_baseline.json"
+SIZES = (10, 100, 1000) # Tickers; pass --sizes ... 5000 for the large universe
+THRESHOLD = 0.20 # Allowed slowdown / memory growth vs the baseline
+SEED = 42
+INTRADAY_DAYS = 59 # Same window the live 15m scan downloads
+
+# --- Fixtures (seeded, no network) ---
+# Fixed calendars, so a baseline stays comparable whatever day it is re-run
+def market_for(n_tickers: int, n_days: int, interval: str = '1d', seed: int = SEED) -> SyntheticMarket:
+    days = pd.bdate_range('2022-01-03', periods=n_days)
+    return SyntheticMarket(n_tickers, start=days[0], end=days[-1], interval=interval, seed=seed)
+
+def daily_panel(n_tickers: int, n_bars: int = 500) -> MarketPanel:
+    """Daily synthetic universe (gaps, halts and late listings included)."""
+    return market_for(n_tickers, n_bars).panel()
+
+def synthetic_decisions(rng: np.random.Generator, tickers: list, n_ticks: int) -> list:
+    """HybridBrain-shaped decision snapshots (one per tick) over a random walk."""
+    prices = 100 * np.exp(np.cumsum(rng.normal(0, 0.004, (n_ticks, len(tickers))), axis=0))
+    confidence = rng.random((n_ticks, len(tickers)))
+    actions = np.array(['WAIT', 'LONG_STOCK', 'IRON_CONDOR', 'LONG_CALL_SNIPER'])[rng.integers(0, 4, (n_ticks, len(tickers)))]
+    return [[{'Ticker': t, 'Action': a, 'Confidence': float(c), 'Price': float(p)}
+             for t, a, c, p in zip(tickers, actions[i], confidence[i], prices[i])]
+            for i in range(n_ticks)]
+
+# --- Benchmarks ---
+# Each takes the universe size and returns (run, units); run() does the work once and
+# returns how many units it processed.
+
+def bench_feature_engineering(size: int):
+    panel = daily_panel(size)
+    loader = MVPDataLoader(tickers=panel.tickers)
+    frames = [panel.ticker_frame(t) for t in panel.tickers]
+    def run():
+        for df in frames:
+            loader.feature_engineering(df)
+        return len(frames)
+    return run, 'tickers'
+
+def bench_create_sequences(size: int):
+    panel = daily_panel(size)
+    loader = MVPDataLoader(tickers=panel.tickers)
+    frames = [loader.feature_engineering(panel.ticker_frame(t)) for t in panel.tickers]
+    def run():
+        return sum(len(loader.create_sequences(df, 'train')[0]) for df in frames)
+    return run, 'sequences'
+
+def bench_tda_process(size: int):
+    if FeatureProcessor is None:
+        return None, 'windows'
+    # One 50-bar window per ticker, capped: persistence is the slowest stage by far
+    close = daily_panel(min(size, 200)).field('Close')
+    windows = [np.log(close[-50:, j]) for j in range(close.shape[1])]
+    processor = FeatureProcessor()
+    def run():
+        for w in windows:
+            processor.process(w)
+        return len(windows)
+    return run, 'windows'
+
+def bench_sniper_scan(size: int):
+    engine = SniperEngine()
+    market = market_for(size, INTRADAY_DAYS, interval='15m')
+    engine.universe = market.tickers
+    engine.loader = SyntheticIntradayLoader(market)
+    def run():
+        return len(engine.run_scan())
+    return run, 'tickers'
+
+def bench_volatility_scan(size: int):
+    engine = VolatilityEngine()
+    panel = daily_panel(size, n_bars=400)
+    engine.universe = panel.tickers
+    def run():
+        return len(engine.run_scan(panel=panel))
+    return run, 'tickers'
+
+def bench_process_tick(size: int, n_ticks: int = 200):
+    ticks = synthetic_decisions(np.random.default_rng(SEED), ticker_names(size), n_ticks)
+    def run():
+        engine = SimulationEngine(persist=False)
+        for decisions in ticks:
+            engine.process_tick(decisions)
+        return len(ticks)
+    return run, 'ticks'
+
+def bench_synthetic_panel(size: int, chunk_size: int = 500):
+    market = market_for(size, 1000)
+    def run():
+        for panel in market.chunks(chunk_size):
+            pass
+        return size
+    return run, 'tickers'
+
+BENCHMARKS = {
+    'synthetic_panel': bench_synthetic_panel,
+    'feature_engineering': bench_feature_engineering,
+    'create_sequences': bench_create_sequences,
+    'tda_process': bench_tda_process,
+    'sniper_scan': bench_sniper_scan,
+    'volatility_scan': bench_volatility_scan,
+    'process_tick': bench_process_tick,
+}
+
+def measure(run, repeat: int = 3) -> dict:
+    """Best-of-`repeat` wall time, then one traced run for peak Python/NumPy memory."""
+    best, units = float('inf'), 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        units = run()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        run()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        'units': units,
+        'seconds': best,
+        'throughput': units / best if best > 0 else float('inf'),
+        'latency_ms': best / units * 1000 if units else 0.0,
+        'peak_mb': peak / 2**20
+    }
+
+def run_suite(names=None, sizes=SIZES, repeat: int = 3) -> dict:
+    """Runs the selected benchmarks at every size. Returns {'name[size]': result}."""
+    results = {}
+    for name in names or BENCHMARKS:
+        for size in sizes:
+            key = f"{name}[{size}]"
+            run, units = BENCHMARKS[name](size)
+            if run is None:
+                logger.warning(f"Skipping {key}: optional dependency missing.")
+                continue
+            results[key] = dict(measure(run, repeat), unit=units)
+            r = results[key]
+            logger.info(f"{key}: {r['throughput']:,.1f} {units}/s, {r['latency_ms']:.3f} ms/{units[:-1]}, peak {r['peak_mb']:.1f} MB")
+    return results
+
+def environment() -> dict:
+    return {
+        'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__,
+        'platform': platform.platform(), 'processor': platform.processor(), 'seed': SEED
+    }
+
+def compare(results: dict, baseline: dict, threshold: float = THRESHOLD) -> list:
+    """
+    Regressions vs a saved baseline: throughput down by more than `threshold`, or peak memory
+    up by more than `threshold` (and at least 1 MB). Benchmarks missing from either side are ignored.
+    """
+    regressions = []
+    for key, r in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if r['throughput'] < base['throughput'] * (1 - threshold):
+            regressions.append(f"{key}: throughput {r['throughput']:,.1f} vs {base['throughput']:,.1f} {r['unit']}/s")
+        if r['peak_mb'] > base['peak_mb'] * (1 + threshold) and r['peak_mb'] - base['peak_mb'] > 1:
+            regressions.append(f"{key}: peak memory {r['peak_mb']:.1f} vs {base['peak_mb']:.1f} MB")
+    return regressions
+
+def print_report(results: dict, baseline: dict = None):
+    print("\n" + "="*96)
+    print("⏱️ BENCHMARKS ⏱️")
+    print("="*96)
+    print(f"{'Benchmark':<28} | {'Throughput':>22} | {'Latency':>12} | {'Peak MB':>8} | {'vs Base':>8}")
+    print("-" * 96)
+    for key, r in results.items():
+        base = (baseline or {}).get(key)
+        delta = f"{(r['throughput'] / base['throughput'] - 1) * 100:+.0f}%" if base else "-"
+        print(f"{key:<28} | {r['throughput']:>12,.1f} {r['unit'] + '/s':<11} | {r['latency_ms']:>9.3f} ms | "
+              f"{r['peak_mb']:>8.1f} | {delta:>8}")
+    print("="*96 + "\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmarks on seeded synthetic data.")
+    parser.add_argument('--only', nargs='*', choices=list(BENCHMARKS), help="Benchmarks to run (default: all)")
+    parser.add_argument('--sizes', nargs='*', type=int, default=list(SIZES), help="Universe sizes (tickers)")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help="Write the results as the new baseline")
+    parser.add_argument('--compare', action='store_true', help="Exit 1 if anything regressed vs the baseline")
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    args = parser.parse_args()
+
+    # The scanners log per ticker at INFO; keep that out of the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    logger.setLevel(logging.INFO)
+
+    baseline = None
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    results = run_suite(args.only, args.sizes, args.repeat)
+    print_report(results, baseline)
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+        logger.info(f"Baseline saved to {args.baseline}")
+
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) beyond {args.threshold:.0%}:")
+            for line in regressions:
+                print("  - " + line)
+            sys.exit(1)
+        print(f"✅ No regressions beyond {args.threshold:.0%}.")
@@ -0,0 +1,93 @@
+import argparse
+import logging
+import numpy as np
+from scan_hybrid import HybridBrain
+from src.data_loader import MVPDataLoader
+from src.panel import MarketPanel
+from src.simulation_engine import SimulationEngine
+from src.multi_portfolio import MultiPortfolioEngine, portfolio_grid
+from src.replay import DECISIONS_PATH, load_decisions, replay, slim
+
+# Configure Logger
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+logger = logging.getLogger('Replay')
+
+NO_VOTE = {'Signal': 'NEUTRAL', 'Confidence': 0.0, 'Reason': 'No Data'}
+
+def backfill_decisions(panel: MarketPanel, brain: HybridBrain = None, window: int = 20) -> list:
+    """
+    Reconstructs the decisions HybridBrain would have made at every bar of a panel:
+    - Income vote from the HV Rank as of that bar (VolatilityEngine.hv_rank_history)
+    - Sniper vote from that bar's VWAP / RSI / Volume Z (SniperEngine features on the panel's bars)
+    - Resolved with HybridBrain.resolve; Price = the bar's close.
+    Returns [(bar, decisions)] for replay(). Tickers are skipped on bars they didn't trade.
+    """
+    brain = brain or HybridBrain()
+    income_expert, sniper_expert = brain.income_expert, brain.sniper_expert
+    n_time = len(panel.index)
+
+    # 1. Regime inputs for the whole panel (one vectorized pass)
+    ranks = income_expert.hv_rank_history(panel, window).to_numpy()
+
+    # 2. Sniper features per ticker, aligned to the panel (NaN until the indicators warm up)
+    features = np.full((3, n_time, len(panel)), np.nan)
+    for j, t in enumerate(panel.tickers):
+        df = sniper_expert.loader.add_technical_indicators(panel.ticker_frame(t))
+        if df is None or df.empty:
+            continue
+        rows = panel.index.get_indexer(df.index)
+        features[:, rows, j] = df[['VWAP', 'RSI', 'Vol_Z']].to_numpy().T
+    close = panel.field('Close')
+
+    # 3. Votes -> decisions, bar by bar
+    ticks = []
+    for i, bar in enumerate(panel.index):
+        decisions = []
+        for j in np.nonzero(panel.valid[i])[0]:
+            t = panel.tickers[j]
+            rank = ranks[i, j]
+            income = income_expert.vote_from_stats(None if np.isnan(rank) else {'HV_Rank': rank})
+            vwap, rsi, vol_z = features[:, i, j]
+            sniper = NO_VOTE if np.isnan(vwap) else sniper_expert.vote_from_features(close[i, j], vwap, rsi, vol_z)
+            decisions.append(brain.resolve(t, income, dict(sniper, Price=float(close[i, j]))))
+        ticks.append((str(bar), slim(decisions)))
+    return ticks
+
+def print_report(report: dict):
+    print("\n" + "="*70)
+    print("⏪ SIMULATION REPLAY ⏪")
+    print("="*70)
+    print(f"Bars: {report['first_bar']} -> {report['last_bar']}")
+    print(f"Ticks: {report['ticks']} in {report['seconds']:.2f}s ({report['ticks_per_sec']:,.0f} ticks/sec)")
+    if 'portfolio' in report:
+        p, m = report['portfolio'], report['metrics']
+        print(f"Balance: {p['balance']:,.2f} | Return: {m['return_pct']:.2f}% | Max DD: {m['max_drawdown_pct']:.2f}%")
+        print(f"Score: {p['score']} | Level: {p['level']} | Status: {p['status']} | Open: {p['open_positions']}")
+        print(f"Trades: {m['trades']} (Buys {m['buys']}, Sells {m['sells']}) | Hit Rate: {m['hit_rate']:.1%} | "
+              f"Realized PnL: {m['realized_pnl']:,.2f} | Reward: {m['total_reward']}")
+    else:
+        print(f"{'Portfolio':<24} | {'Balance':>12} | {'Max DD':>8} | {'Score':>6} | {'Level':<20} | {'Status'}")
+        print("-" * 70)
+        for row in report['portfolios']:
+            print(f"{row['name']:<24} | {row['balance']:>12,.2f} | {row['max_drawdown_pct']:>7.2f}% | "
+                  f"{row['score']:>6} | {row['level']:<20} | {row['status']}")
+    print("="*70 + "\n")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay recorded or backfilled decisions through the simulation (no persistence).")
+    parser.add_argument('--recorded', nargs='?', const=DECISIONS_PATH, help="Decision log written by the API (default: %(const)s)")
+    parser.add_argument('--tickers', nargs='*', help="Backfill universe (default: the Income Expert's universe)")
+    parser.add_argument('--portfolios', action='store_true', help="Replay through the multi-portfolio grid instead")
+    args = parser.parse_args()
+
+    if args.recorded:
+        ticks = list(load_decisions(args.recorded))
+    else:
+        brain = HybridBrain()
+        universe = args.tickers or brain.income_expert.universe
+        panel = MVPDataLoader(tickers=universe).fetch_panel()
+        logger.info(f"Backfilling decisions for {len(panel)} tickers x {len(panel.index)} bars...")
+        ticks = backfill_decisions(panel, brain)
+
+    engine = MultiPortfolioEngine(portfolio_grid()) if args.portfolios else SimulationEngine(persist=False)
+    print_report(replay(ticks, engine))
@@ -2,6 +2,7 @@ import logging
 import pandas as pd
 from scan_intraday import SniperEngine
 from scan_volatility import VolatilityEngine
+from src.metrics import span, timed
 
 # Configure Logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -16,7 +17,9 @@ class HybridBrain:
     def __init__(self):
         self.sniper_expert = SniperEngine()
         self.income_expert = VolatilityEngine()
+        self.last_bar = None # Newest market bar behind the last think()
         
+    @timed('think')
     def think(self):
         """
         Runs the Recursive Thinking Process.
@@ -33,6 +36,7 @@ class HybridBrain:
         # 2. Ask Sniper Expert (Momentum)
         sniper_votes = self.sniper_expert.run_scan()
         sniper_map = {v['Ticker']: v for v in sniper_votes}
+        self.last_bar = self.sniper_expert.last_bar
         
         final_decisions = []
         
@@ -42,75 +46,22 @@ class HybridBrain:
         for t in all_tickers:
             income = income_map.get(t, {'Signal': 'NEUTRAL', 'Confidence': 0.0, 'Reason': 'N/A'})
             sniper = sniper_map.get(t, {'Signal': 'NEUTRAL', 'Confidence': 0.0, 'Reason': 'N/A'})
-            
-            # --- Thinking Logic ---
-            decision = {
-                'Ticker': t,
-                'Action': 'WAIT',
-                'Confidence': 0.0,
-                'Rational': []
-            }
-            
-            # A. High Volatility Regime (Income Expert Dominates)
-            if income['Signal'] == 'INCOME':
-                decision['Rational'].append(f"Regime: High Volatility ({income['Confidence']:.2f})")
-                
-                # Check if Sniper agrees (Momentum is huge?)
-                if sniper['Signal'] == 'BUY':
-                    # Conflict: High Vol but Bullish Momentum?
-                    # Result: Bullish Put Spread (Defined Risk) instead of Naked Calls
-                    decision['Action'] = 'BULL_PUT_SPREAD'
-                    decision['Confidence'] = (income['Confidence'] + sniper['Confidence']) / 2
-                    decision['Rational'].append(f"Solution: Hybrid. High Vol + Bullish Momentum -> Credit Spread.")
-                else:
-                    # Pure Income
-                    decision['Action'] = 'IRON_CONDOR'
-                    decision['Confidence'] = income['Confidence']
-                    decision['Rational'].append("Solution: Pure Volatility Play (Sell Neutral Premium).")
-            
-            # B. Low Volatility Regime (Sniper Prep)
-            elif income['Signal'] == 'SNIPER_PREP':
-                 decision['Rational'].append(f"Regime: Low Volatility (Coiled).")
-                 
-                 if sniper['Signal'] == 'BUY':
-                     # The Perfect Storm: Low Vol + Breakout
-                     decision['Action'] = 'LONG_CALL_SNIPER'
-                     decision['Confidence'] = max(income['Confidence'], sniper['Confidence']) + 0.1 # Boost!
-                     decision['Rational'].append("Solution: PERFECT SETUP. Vol Expansion + Trend.")
-                 else:
-                     # Waiting for the move
-                     decision['Action'] = 'WATCH_FOR_BREAKOUT'
-                     decision['Confidence'] = 0.5
-                     decision['Rational'].append("Solution: Stalking. Vol is low, waiting for Sniper Trigger.")
-            
-            # C. Normal Regime (Sniper leads)
-            else:
-                 if sniper['Signal'] == 'BUY':
-                     decision['Action'] = 'LONG_STOCK'
-                     decision['Confidence'] = sniper['Confidence']
-                     decision['Rational'].append(f"Regime: Normal. Following Momentum.")
-                 else:
-                     # Default logic for NEUTRAL/WAIT
-                     decision['Action'] = 'WAIT'
-                     decision['Confidence'] = 0.0
-                     decision['Rational'].append("Market is efficient. No edge detected.")
+            decision = self.resolve(t, income, sniper)
             
             # --- Chart Data Injection (Sparkline) ---
             # We need to fetch the dataframe again to get the history.
             # In a production system, we would cache this in the Experts to avoid re-fetching.
             try:
-                hist_df = self.sniper_expert.loader.fetch_data(t, interval='15m', period='5d')
+                with span('sparkline'):
+                    hist_df = self.sniper_expert.loader.fetch_data(t, interval='15m', period='5d')
                 if hist_df is not None and not hist_df.empty:
-                    # Keep last 60 points (Better Resolution)
-                    subset = hist_df.tail(60).reset_index()
-                    decision['History'] = [
-                        {
-                            "Time": row['Datetime'].strftime('%H:%M') if pd.notnull(row['Datetime']) else str(row['Datetime']), 
-                            "Close": round(row['Close'], 2),
-                            "Volume": int(row['Volume'])
-                        } 
-                        for _, row in subset.iterrows()
-                    ]
+                    # Keep last 60 points (Better Resolution), column-oriented
+                    subset = hist_df.tail(60)
+                    decision['History'] = {
+                        "Time": subset.index.strftime('%H:%M').tolist(),
+                        "Close": subset['Close'].round(2).tolist(),
+                        "Volume": subset['Volume'].astype(int).tolist()
+                    }
             except Exception as e:
                 logger.warning(f"Could not fetch history for chart {t}: {e}")
                 decision['History'] = []
@@ -119,6 +70,66 @@ class HybridBrain:
             
         return final_decisions
 
+    @staticmethod
+    def resolve(t: str, income: dict, sniper: dict) -> dict:
+        """
+        Resolves one ticker's expert votes (Income + Sniper) into a decision (without the chart History).
+        Shared by think() and the historical replay backfill.
+        """
+        # --- Thinking Logic ---
+        decision = {
+            'Ticker': t,
+            'Action': 'WAIT',
+            'Confidence': 0.0,
+            'Price': sniper.get('Price'), # Last 15m close (used by the simulation; None = no quote)
+            'Rational': []
+        }
+        
+        # A. High Volatility Regime (Income Expert Dominates)
+        if income['Signal'] == 'INCOME':
+            decision['Rational'].append(f"Regime: High Volatility ({income['Confidence']:.2f})")
+            
+            # Check if Sniper agrees (Momentum is huge?)
+            if sniper['Signal'] == 'BUY':
+                # Conflict: High Vol but Bullish Momentum?
+                # Result: Bullish Put Spread (Defined Risk) instead of Naked Calls
+                decision['Action'] = 'BULL_PUT_SPREAD'
+                decision['Confidence'] = (income['Confidence'] + sniper['Confidence']) / 2
+                decision['Rational'].append(f"Solution: Hybrid. High Vol + Bullish Momentum -> Credit Spread.")
+            else:
+                # Pure Income
+                decision['Action'] = 'IRON_CONDOR'
+                decision['Confidence'] = income['Confidence']
+                decision['Rational'].append("Solution: Pure Volatility Play (Sell Neutral Premium).")
+        
+        # B. Low Volatility Regime (Sniper Prep)
+        elif income['Signal'] == 'SNIPER_PREP':
+             decision['Rational'].append(f"Regime: Low Volatility (Coiled).")
+             
+             if sniper['Signal'] == 'BUY':
+                 # The Perfect Storm: Low Vol + Breakout
+                 decision['Action'] = 'LONG_CALL_SNIPER'
+                 decision['Confidence'] = max(income['Confidence'], sniper['Confidence']) + 0.1 # Boost!
+                 decision['Rational'].append("Solution: PERFECT SETUP. Vol Expansion + Trend.")
+             else:
+                 # Waiting for the move
+                 decision['Action'] = 'WATCH_FOR_BREAKOUT'
+                 decision['Confidence'] = 0.5
+                 decision['Rational'].append("Solution: Stalking. Vol is low, waiting for Sniper Trigger.")
+        
+        # C. Normal Regime (Sniper leads)
+        else:
+             if sniper['Signal'] == 'BUY':
+                 decision['Action'] = 'LONG_STOCK'
+                 decision['Confidence'] = sniper['Confidence']
+                 decision['Rational'].append(f"Regime: Normal. Following Momentum.")
+             else:
+                 # Default logic for NEUTRAL/WAIT
+                 decision['Action'] = 'WAIT'
+                 decision['Confidence'] = 0.0
+                 decision['Rational'].append("Market is efficient. No edge detected.")
+        return decision
+
 if __name__ == "__main__":
     brain = HybridBrain()
     thoughts = brain.think()
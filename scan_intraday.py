@@ -1,6 +1,7 @@
 import pandas as pd
 import logging
 from src.data_loader_intraday import IntradayDataLoader
+from src.metrics import timed
 
 # Configure Logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -17,7 +18,9 @@ class SniperEngine:
         # Full Indian Market (Nifty 100 + Key Midcaps)
         from src.ticker_utils import get_nifty_total_market
         self.universe = ["^NSEI", "^NSEBANK"] + get_nifty_total_market()
+        self.last_bar = None
         
+    @timed('sniper_vote')
     def get_vote(self, ticker: str, df: pd.DataFrame) -> dict:
         """
         Analyzes the latest candle to generate a Vote.
@@ -27,13 +30,12 @@ class SniperEngine:
             return {'Signal': 'NEUTRAL', 'Confidence': 0.0, 'Reason': 'No Data'}
             
         last_row = df.iloc[-1]
-        
-        # Features
-        price = last_row['Close']
-        vwap = last_row['VWAP']
-        rsi = last_row['RSI']
-        vol_z = last_row['Vol_Z']
-        
+        return self.vote_from_features(last_row['Close'], last_row['VWAP'], last_row['RSI'], last_row['Vol_Z'])
+
+    def vote_from_features(self, price: float, vwap: float, rsi: float, vol_z: float) -> dict:
+        """
+        Maps one candle's Sniper features (see add_technical_indicators) to a Vote.
+        """
         # Logic: Bullish Sniper
         # 1. Price > VWAP (Institutional Support)
         # 2. RSI > 55 (Momentum Picking Up) but < 75 (Not Exhausted)
@@ -78,11 +80,13 @@ class SniperEngine:
                 'Reason': "Wait for setup"
             }
 
+    @timed('sniper_scan')
     def run_scan(self):
         """
         Scans values and returns a Report List.
         """
         results = []
+        self.last_bar = None # Timestamp of the newest 15m bar seen in this scan
         logger.info(f"Scanning {len(self.universe)} tickers for Sniper Setups (15m)...")
         
         for t in self.universe:
@@ -99,6 +103,8 @@ class SniperEngine:
             if df is not None and not df.empty:
                 try:
                     current_price = df.iloc[-1]['Close']
+                    if self.last_bar is None or df.index[-1] > self.last_bar:
+                        self.last_bar = df.index[-1]
                 except: pass
 
             # Always append result, even if Neutral (for Search visibility)
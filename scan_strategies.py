@@ -1,9 +1,15 @@
 import pandas as pd
 import numpy as np
 import logging
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from numpy.lib.stride_tricks import sliding_window_view
 from src.ticker_utils import get_extended_tickers
 from src.data_loader import MVPDataLoader
 from src.patterns import CandlestickDetector
+from src.data_loader_intraday import IntradayDataLoader
+from src.panel import MarketPanel
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger("ScanStrategies")
@@ -36,192 +42,326 @@ def strategy_golden_cross(df):
     ema_200 = df['Close'].ewm(span=200, adjust=False).mean()
     return (df['Close'] > df['EMA_50']) & (df['EMA_50'] > ema_200)
 
-def scan_strategies():
+def simulate_managed_trades(df: pd.DataFrame, tp: float = 0.02, sl: float = 0.01, horizon: int = 1) -> pd.DataFrame:
+    """
+    Managed-trade outcome for an entry at every bar's Close, held for up to `horizon` bars.
+    The next `horizon` Highs/Lows are scanned as sliding windows to find the first bar
+    where TP or SL is crossed (no per-trade loop), so every strategy can reuse the result.
+    
+    If both are crossed in the same bar it counts as SL (conservative) and is flagged Ambiguous.
+    If neither is crossed, the trade exits at the Close of the last bar of the horizon.
+    
+    Returns, per entry bar: Outcome (1 TP, -1 SL, 0 time exit), Return, Bars_Held,
+    Exit_Date, Ambiguous, Valid (a full horizon of data exists after the entry).
+    """
+    close = df['Close'].to_numpy(dtype=np.float64)
+    high = df['High'].to_numpy(dtype=np.float64)
+    low = df['Low'].to_numpy(dtype=np.float64)
+    n = len(close)
+    
+    # Entry at Close today (Signal Trigger)
+    tp_price = close * (1 + tp)
+    sl_price = close * (1 - sl)
+    
+    # (n, horizon) views of bars t+1 .. t+horizon; NaN padding past the end never triggers
+    pad = np.full(horizon, np.nan)
+    fwd_high = sliding_window_view(np.concatenate([high[1:], pad]), horizon)
+    fwd_low = sliding_window_view(np.concatenate([low[1:], pad]), horizon)
+    
+    hit_tp = fwd_high >= tp_price[:, None]
+    hit_sl = fwd_low <= sl_price[:, None]
+    first_tp = np.where(hit_tp.any(axis=1), hit_tp.argmax(axis=1), horizon)
+    first_sl = np.where(hit_sl.any(axis=1), hit_sl.argmax(axis=1), horizon)
+    
+    outcome = np.zeros(n, dtype=np.int8)
+    outcome[first_tp < first_sl] = 1
+    outcome[(first_sl <= first_tp) & (first_sl < horizon)] = -1
+    
+    bars_held = np.where(outcome == 0, horizon, np.minimum(first_tp, first_sl) + 1)
+    exit_idx = np.minimum(np.arange(n) + bars_held, n - 1)
+    
+    returns = np.where(outcome == 1, tp, np.where(outcome == -1, -sl, close[exit_idx] / close - 1))
+    
+    return pd.DataFrame({
+        'Outcome': outcome,
+        'Return': returns,
+        'Bars_Held': bars_held,
+        'Exit_Date': df.index[exit_idx],
+        'Ambiguous': (first_tp == first_sl) & (first_sl < horizon),
+        'Valid': np.arange(n) + horizon <= n - 1
+    }, index=df.index)
+
+# Max history yfinance serves per intraday interval (counted back from today)
+INTRADAY_PERIODS = {'1m': '7d', '5m': '59d', '15m': '59d'}
+EXCHANGE_TZ = {'.NS': 'Asia/Kolkata', '.BO': 'Asia/Kolkata'} # By ticker suffix; default US
+
+def exchange_today(ticker: str) -> pd.Timestamp:
+    """Today's date in the ticker's exchange time (naive, like the daily bars)."""
+    tz = next((tz for suffix, tz in EXCHANGE_TZ.items() if ticker.endswith(suffix)), 'America/New_York')
+    return pd.Timestamp.now(tz=tz).normalize().tz_localize(None)
+
+def resolve_ambiguous_outcomes(bars: pd.DataFrame, days, tp_prices, sl_prices) -> np.ndarray:
+    """
+    Settles trades whose daily bar touched both TP and SL by finding which level the
+    intraday bars of that day hit first.
+    
+    bars: intraday OHLC with a sorted DatetimeIndex (exchange time).
+    days: the trade day of each ambiguous trade (the bar after the signal).
+    Returns 1 (TP first), -1 (SL first or both in the same bar) or 0 (no intraday bars that day).
+    """
+    outcomes = np.zeros(len(days), dtype=np.int8)
+    if bars is None or bars.empty or len(days) == 0:
+        return outcomes
+    
+    index = bars.index.tz_localize(None) if bars.index.tz is not None else bars.index
+    times = index.values.astype('datetime64[ns]').view(np.int64)
+    highs = bars['High'].to_numpy(dtype=np.float64)
+    lows = bars['Low'].to_numpy(dtype=np.float64)
+    
+    # Binary search each trade day's [start, end) slice in the sorted time index
+    day_start = pd.DatetimeIndex(days).normalize().values.astype('datetime64[ns]').view(np.int64)
+    one_day = np.timedelta64(1, 'D').astype('timedelta64[ns]').astype(np.int64)
+    lo = np.searchsorted(times, day_start, side='left')
+    hi = np.searchsorted(times, day_start + one_day, side='left')
+    
+    for k in range(len(outcomes)):
+        if lo[k] == hi[k]: continue # Day not covered by the intraday history
+        hit_tp = highs[lo[k]:hi[k]] >= tp_prices[k]
+        hit_sl = lows[lo[k]:hi[k]] <= sl_prices[k]
+        first_tp = hit_tp.argmax() if hit_tp.any() else len(hit_tp)
+        first_sl = hit_sl.argmax() if hit_sl.any() else len(hit_sl)
+        outcomes[k] = 1 if first_tp < first_sl else -1
+    return outcomes
+
+def settle_with_intraday(t, df, trades, candidates, intraday_loader, intraday_interval='15m', today=None) -> dict:
+    """
+    Settles the ambiguous trades selected by `candidates` (bool mask over `trades`) with
+    intraday bars, updating Outcome / Return in place.
+    
+    yfinance only serves intraday bars for the last few days (INTRADAY_PERIODS, counted back
+    from `today`, default: today in the ticker's exchange time), so bars are fetched only if a
+    candidate exit day falls in that window. Days without bars keep their conservative SL.
+    Returns {'lookups': days settled with bars, 'tp_first': of those, TP first, 'unresolved': the rest}.
+    """
+    period = INTRADAY_PERIODS.get(intraday_interval, '59d')
+    today = exchange_today(t) if today is None else pd.Timestamp(today)
+    exit_days = trades['Exit_Date'].dt.normalize()
+    window = candidates & (exit_days >= today - pd.Timedelta(days=int(period[:-1]))) & (exit_days <= today)
+    result = {'lookups': 0, 'tp_first': 0, 'unresolved': int(candidates.sum())}
+    if not window.any():
+        return result # Nothing the intraday history could cover: no fetch
+    
+    bars = intraday_loader.get_cached(t, interval=intraday_interval, period=period)
+    entry = df['Close'][window].values
+    outcomes = resolve_ambiguous_outcomes(bars, trades['Exit_Date'][window].values, entry * 1.02, entry * 0.99)
+    covered = outcomes != 0
+    settled = window.copy()
+    settled[window] = covered
+    trades.loc[settled, 'Outcome'] = outcomes[covered]
+    trades.loc[settled, 'Return'] = np.where(outcomes[covered] == 1, 0.02, -0.01)
+    result['lookups'] = int(covered.sum())
+    result['tp_first'] = int((outcomes == 1).sum())
+    result['unresolved'] -= result['lookups']
+    return result
+
+STRATEGIES = {
+    "Hammer + RSI Dip": strategy_hammer_reversal,
+    "Bullish Engulfing Trend": strategy_engulfing_trend,
+    "RSI < 30 (Pure)": strategy_simple_dip,
+    "Golden Cross (Long Term)": strategy_golden_cross
+}
+
+def _scan_ticker(t, df, horizon=1, intraday_loader=None, intraday_interval='15m'):
+    """
+    Feature engineering, patterns, managed-trade backtest and recent signals for one ticker.
+    Returns {'stats': {strategy: {...}}, 'opportunities': [...], 'lookups': int, 'tp_first': int,
+    'unresolved': int} or None.
+    """
+    loader = MVPDataLoader(tickers=[t], window_size=50)
+    result = {'stats': {}, 'opportunities': [], 'lookups': 0, 'tp_first': 0, 'unresolved': 0}
+    
+    # 1. Feature Engineering (EMA, RSI, Patterns)
+    # FIX: return_raw=True to keep Open/High/Low for Pattern Detection
+    df = loader.feature_engineering(df, return_raw=True)
+    if df.empty: return None
+    
+    # Add Patterns
+    df = CandlestickDetector.add_patterns(df)
+    
+    # 2. Backtest Logic (Managed Trade)
+    # Core Problem: Close-to-Close ignores intraday potential.
+    # Solution: Check if High > TP before Low < SL.
+    
+    # Assumptions for "Sniper" Mode:
+    # TP = 2.0% (0.02)
+    # SL = 1.0% (0.01)
+    # Ratio = 2:1
+    
+    # Entry at Close today (Signal Trigger), managed for up to `horizon` bars.
+    # Outcome: 1 (Win, TP first), -1 (Loss, SL first or both in one bar), 0 (time exit at Close)
+    trades = simulate_managed_trades(df, tp=0.02, sl=0.01, horizon=horizon)
+    
+    signals_by_name = {name: strategy_func(df) for name, strategy_func in STRATEGIES.items()}
+    
+    # Optional: settle ambiguous exit days that actually carry a signal with intraday bars
+    if intraday_loader is not None:
+        ambiguous = trades['Ambiguous'] & trades['Valid']
+        ambiguous &= pd.concat(signals_by_name.values(), axis=1).any(axis=1)
+        result.update(settle_with_intraday(t, df, trades, ambiguous, intraday_loader, intraday_interval))
+    
+    # Returns for stats
+    # Win = +2%
+    # Loss = -1%
+    # Neutral = (Exit Close - Entry) / Entry
+    
+    for name, signals in signals_by_name.items():
+        # Filter valid signals (need the full horizon after entry)
+        taken = trades[signals & trades['Valid']]
+        
+        if len(taken) > 0:
+            total_pnl = taken['Return'].sum()
+            result['stats'][name] = {
+                'wins': int((taken['Outcome'] == 1).sum()),
+                'total': len(taken),
+                'avg_pnl': total_pnl / len(taken),
+                'pnl_sum': total_pnl,
+                'bars_held': int(taken['Bars_Held'].sum())
+            }
+            
+    # Store Recent Signals for "Live Opportunities" Report
+    # Get last 5 days
+    recent_df = df.iloc[-5:].copy()
+    
+    for name, strategy_func in STRATEGIES.items():
+        signals = strategy_func(recent_df)
+        active_days = recent_df[signals]
+        
+        for date, row in active_days.iterrows():
+            # Generate Rationale
+            reason = []
+            if name == "Hammer + RSI Dip":
+                reason.append("Bullish Hammer pattern detected")
+                reason.append(f"RSI is oversold ({row['RSI']:.1f})")
+                reason.append("Price above EMA50 Trend")
+            elif name == "Bullish Engulfing Trend":
+                reason.append("Bullish Engulfing pattern (Strong Reversal)")
+                reason.append("Confirmed by Up Trend (Above EMA50)")
+            elif name == "RSI < 30 (Pure)":
+                reason.append(f"Deep Oversold Condition (RSI {row['RSI']:.1f})")
+                reason.append("Mean Reversion Potential")
+            elif name == "Golden Cross (Long Term)":
+                reason.append("Golden Cross (EMA50 > EMA200)")
+                reason.append("Long-term Bullish Trend confirmed")
+                
+            result['opportunities'].append({
+                'Ticker': t,
+                'Date': date.date(),
+                'Strategy': name,
+                'Price': row['Close'],
+                'Rationale': " + ".join(reason)
+            })
+    return result
+
+# Per-process state for pool workers (set by _init_scan_worker)
+_scan_worker = {}
+
+def _init_scan_worker(panel_spec, horizon, resolve_intraday, intraday_interval):
+    """Attaches a worker to the shared MarketPanel; nothing big is pickled."""
+    panel, shm = MarketPanel.from_shared(panel_spec)
+    _scan_worker.update({
+        'shm': shm, # Keep the mapping alive for the worker's lifetime
+        'panel': panel,
+        'horizon': horizon,
+        'intraday_loader': IntradayDataLoader() if resolve_intraday else None,
+        'intraday_interval': intraday_interval
+    })
+
+def _scan_panel_column(j):
+    w = _scan_worker
+    t = w['panel'].tickers[j]
+    try:
+        df = w['panel'].ticker_frame(t)
+        return _scan_ticker(t, df, w['horizon'], w['intraday_loader'], w['intraday_interval'])
+    except Exception as e:
+        logger.error(f"Error on {t}: {e}")
+        return None
+
+def scan_strategies(resolve_intraday: bool = False, intraday_interval: str = '15m', horizon: int = 1, n_jobs: int = None):
+    """
+    horizon: max bars a trade is held before exiting at the Close (1 = next day only).
+    resolve_intraday: settle days where both TP and SL were touched using cached intraday
+    bars (only for those trades, and only as far back as yfinance serves `intraday_interval`).
+    Otherwise they count as losses.
+    n_jobs: worker processes for the per-ticker scan (default: all cores, 1 = in-process).
+    """
     logger.info("Loading Data...")
     tickers = get_extended_tickers(limit=500000)
     # Using window_size=50 just to init standard loader features
     loader = MVPDataLoader(tickers=tickers, window_size=50) 
     
     # We want the RAW DateFrames, not the X/y sequences.
-    # So we use fetch_batch_data + process_single_ticker_data logic manually
-    full_df = loader.fetch_batch_data()
-    
-    results = []
-    
-    # Iterate Tickers
-    is_multi = isinstance(full_df.columns, pd.MultiIndex)
-    
-    total_trades = 0
+    # So we use fetch_panel (one contiguous field x time x ticker array) + feature_engineering manually
+    panel = loader.fetch_panel()
+    tickers = panel.tickers
     
-    strategies = {
-        "Hammer + RSI Dip": strategy_hammer_reversal,
-        "Bullish Engulfing Trend": strategy_engulfing_trend,
-        "RSI < 30 (Pure)": strategy_simple_dip,
-        "Golden Cross (Long Term)": strategy_golden_cross
-    }
-    
-    # Init stats
-    stats = {name: {'wins': 0, 'total': 0, 'returns': []} for name in strategies}
-    recent_opportunities = []
+    n_jobs = min(n_jobs or os.cpu_count() or 1, max(len(tickers), 1))
     
     # Scale Up: Use ALL available tickers (approx 550)
-    logger.info("Scanning Strategies on ALL tickers...")
+    logger.info(f"Scanning Strategies on ALL tickers ({len(tickers)} tickers, {n_jobs} processes)...")
     
-    for t in tickers:
+    if n_jobs == 1:
+        _scan_worker.update({'panel': panel, 'horizon': horizon,
+                             'intraday_loader': IntradayDataLoader() if resolve_intraday else None,
+                             'intraday_interval': intraday_interval})
+        per_ticker = [_scan_panel_column(j) for j in range(len(tickers))]
+        _scan_worker.clear()
+    else:
+        # Shared memory: workers map the panel instead of receiving pickled frames
+        shm, panel_spec = panel.to_shared()
         try:
-            if is_multi:
-                if t in full_df.columns.get_level_values(0):
-                    df = full_df[t].copy()
-                else:
-                    continue
-            else:
-                if len(tickers) == 1: df = full_df.copy()
-                else: continue
-            
-            # Debug: Check columns if 'Open' missing
-            if 'Open' not in df.columns:
-                logger.warning(f"Ticker {t} columns: {df.columns.tolist()}")
-                # Try simple fix if columns are MultiIndex inside
-                if isinstance(df.columns, pd.MultiIndex):
-                    df.columns = df.columns.droplevel(0) # Maybe it's (Ticker, Price) inside?
-            
-            # 1. Feature Engineering (EMA, RSI, Patterns)
-            # FIX: return_raw=True to keep Open/High/Low for Pattern Detection
-            df = loader.feature_engineering(df, return_raw=True)
-            if df.empty: continue
-            
-            # Add Patterns
-            df = CandlestickDetector.add_patterns(df)
-            
-            # 2. Backtest Logic (Managed Trade)
-            # Core Problem: Close-to-Close ignores intraday potential.
-            # Solution: Check if High > TP before Low < SL.
-            
-            # Assumptions for "Sniper" Mode:
-            # TP = 2.0% (0.02)
-            # SL = 1.0% (0.01)
-            # Ratio = 2:1
-            
-            next_open = df['Open'].shift(-1)
-            next_high = df['High'].shift(-1)
-            next_low = df['Low'].shift(-1)
-            next_close = df['Close'].shift(-1)
-            
-            # Entry usually at Close today (or Open tomorrow). Let's assume Close Today (Signal Trigger).
-            entry_price = df['Close']
-            
-            # Vectorized Logic for Managed Outcome
-            tp_price = entry_price * 1.02
-            sl_price = entry_price * 0.99
-            
-            # Did we hit SL?
-            hit_sl = next_low < sl_price
-            # Did we hit TP?
-            hit_tp = next_high > tp_price
-            
-            # Logic: 
-            # If hit_tp AND NOT hit_sl: Win
-            # If hit_sl AND NOT hit_tp: Loss
-            # If Both: Ambiguous (Volatile). Assume Loss (Conservative) or Stopped Out first.
-            #     (Realistically need minute data to know which happened first, but we assume SL hit first for safety).
-            # If Neither: Trade held to Close.
-            
-            # Outcome: 1 (Win), -1 (Loss), 0 (Neutral/Hold)
-            # Vectorize:
-            # Win: (High >= TP) & (Low > SL) -> Ideal Win
-            # Loss: (Low <= SL)
-            # Neutral: Else (Close trade at End of Day)
-            
-            managed_outcome = pd.Series(0, index=df.index)
-            # Wins: Reached TP and didn't touch SL
-            managed_outcome[(next_high >= tp_price) & (next_low > sl_price)] = 1 
-            # Losses: Touched SL
-            managed_outcome[next_low <= sl_price] = -1
-            # Ambiguous (Both Hit): Treat as Loss (Stopped Out)
-            managed_outcome[(next_high >= tp_price) & (next_low <= sl_price)] = -1 
-            
-            # Returns for stats
-            # Win = +2%
-            # Loss = -1%
-            # Neutral = (Next Close - Entry) / Entry
-            
-            for name, strategy_func in strategies.items():
-                signals = strategy_func(df)
-                
-                # Filter valid signals (drop last row nan)
-                valid_indices = signals & next_close.notna()
-                outcomes = managed_outcome[valid_indices]
-                
-                if len(outcomes) > 0:
-                    # Calculate Stats
-                    wins = (outcomes == 1).sum()
-                    losses = (outcomes == -1).sum()
-                    neutrals = (outcomes == 0).sum()
-                    
-                    # Neutral Returns
-                    neutral_indices = valid_indices & (managed_outcome == 0)
-                    neutral_rets = (next_close[neutral_indices] - entry_price[neutral_indices]) / entry_price[neutral_indices]
-                    
-                    # Total PnL points (Approx)
-                    total_pnl = (wins * 0.02) + (losses * -0.01) + neutral_rets.sum()
-                    avg_pnl = total_pnl / len(outcomes)
-                    
-                    stats[name]['wins'] += wins
-                    stats[name]['total'] += len(outcomes)
-                    stats[name]['returns'].append(avg_pnl) # storing avg of batch, simpler
-                    stats[name]['pnl_sum'] = stats[name].get('pnl_sum', 0.0) + total_pnl
-                    
-            # Store Recent Signals for "Live Opportunities" Report
-            # Get last 5 days
-            recent_df = df.iloc[-5:].copy()
-            
-            for name, strategy_func in strategies.items():
-                signals = strategy_func(recent_df)
-                active_days = recent_df[signals]
-                
-                for date, row in active_days.iterrows():
-                    # Generate Rationale
-                    reason = []
-                    if name == "Hammer + RSI Dip":
-                        reason.append("Bullish Hammer pattern detected")
-                        reason.append(f"RSI is oversold ({row['RSI']:.1f})")
-                        reason.append("Price above EMA50 Trend")
-                    elif name == "Bullish Engulfing Trend":
-                        reason.append("Bullish Engulfing pattern (Strong Reversal)")
-                        reason.append("Confirmed by Up Trend (Above EMA50)")
-                    elif name == "RSI < 30 (Pure)":
-                        reason.append(f"Deep Oversold Condition (RSI {row['RSI']:.1f})")
-                        reason.append("Mean Reversion Potential")
-                    elif name == "Golden Cross (Long Term)":
-                        reason.append("Golden Cross (EMA50 > EMA200)")
-                        reason.append("Long-term Bullish Trend confirmed")
-                        
-                    recent_opportunities.append({
-                        'Ticker': t,
-                        'Date': date.date(),
-                        'Strategy': name,
-                        'Price': row['Close'],
-                        'Rationale': " + ".join(reason)
-                    })
-                    
-        except Exception as e:
-            logger.error(f"Error on {t}: {e}")
-            continue
+            init_args = (panel_spec, horizon, resolve_intraday, intraday_interval)
+            with ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_scan_worker, initargs=init_args) as pool:
+                # map preserves ticker order, so the reduction below is deterministic
+                per_ticker = list(pool.map(_scan_panel_column, range(len(tickers)), chunksize=max(1, len(tickers) // (n_jobs * 4))))
+        finally:
+            shm.close()
+            shm.unlink()
+    
+    # Reduce (in ticker order)
+    stats = {name: {'wins': 0, 'total': 0, 'returns': []} for name in STRATEGIES}
+    recent_opportunities = []
+    resolved = {'lookups': 0, 'tp_first': 0, 'unresolved': 0}
+    for res in per_ticker:
+        if res is None: continue
+        for name, st in res['stats'].items():
+            stats[name]['wins'] += st['wins']
+            stats[name]['total'] += st['total']
+            stats[name]['returns'].append(st['avg_pnl']) # storing avg of batch, simpler
+            stats[name]['pnl_sum'] = stats[name].get('pnl_sum', 0.0) + st['pnl_sum']
+            stats[name]['bars_held'] = stats[name].get('bars_held', 0) + st['bars_held']
+        recent_opportunities.extend(res['opportunities'])
+        resolved['lookups'] += res['lookups']
+        resolved['tp_first'] += res['tp_first']
+        resolved['unresolved'] += res['unresolved']
 
     print("\n" + "="*70)
-    print("📊 MANAGED STRATEGY RESULTS (TP=+2%, SL=-1%) 📊")
+    print(f"📊 MANAGED STRATEGY RESULTS (TP=+2%, SL=-1%, Max Hold={horizon}d) 📊")
+    if resolve_intraday:
+        print(f"Ambiguous days resolved with {intraday_interval} bars: {resolved['lookups']} ({resolved['tp_first']} hit TP first), "
+              f"{resolved['unresolved']} without intraday bars (counted as SL)")
     print("="*70)
-    print(f"{'Strategy':<30} | {'Win Rate':<10} | {'Trades':<8} | {'Avg PnL':<10}")
+    print(f"{'Strategy':<30} | {'Win Rate':<10} | {'Trades':<8} | {'Avg PnL':<10} | {'Avg Hold':<8}")
     print("-" * 70)
     
     for name, data in stats.items():
         total = data['total']
         if total == 0:
-            print(f"{name:<30} | {'N/A':<10} | {0:<8} | {'N/A':<10}")
+            print(f"{name:<30} | {'N/A':<10} | {0:<8} | {'N/A':<10} | {'N/A':<8}")
         else:
             win_rate = (data['wins'] / total) * 100
             avg_pnl = data.get('pnl_sum', 0.0) / total
-            print(f"{name:<30} | {win_rate:.2f}%     | {total:<8} | {avg_pnl:.5f}")
+            avg_hold = data.get('bars_held', 0) / total
+            print(f"{name:<30} | {win_rate:.2f}%     | {total:<8} | {avg_pnl:.5f}    | {avg_hold:.1f}d")
             
     print("="*70)
     
@@ -242,5 +382,214 @@ def scan_strategies():
             
     print("="*80 + "\n")
 
+# --- Walk-Forward Parameter Sweep ---
+
+def build_signal_grid(ema_spans, rsi_thresholds):
+    """
+    Enumerates every distinct (strategy, EMA span, RSI threshold) rule.
+    Parameters a strategy doesn't use are NaN (so e.g. RSI Dip isn't repeated per EMA span).
+    """
+    grid = []
+    for ema in ema_spans:
+        for rsi in rsi_thresholds:
+            grid.append(("Hammer + RSI Dip", ema, rsi))
+        grid.append(("Bullish Engulfing Trend", ema, np.nan))
+        grid.append(("Golden Cross (Long Term)", ema, np.nan))
+    for rsi in rsi_thresholds:
+        grid.append(("RSI < 30 (Pure)", np.nan, rsi))
+    return pd.DataFrame(grid, columns=['Strategy', 'EMA_Span', 'RSI_Threshold'])
+
+def _sweep_ticker(df, signal_grid, tp_grid, sl_grid, block_edges):
+    """
+    Evaluates every rule x TP x SL combination on one ticker.
+    Features are computed once; outcomes for the whole TP/SL grid are broadcast to
+    (n_tp * n_sl, T) and reduced against the (n_rules, T) signal matrix with a matmul.
+    Returns per-time-block sums so walk-forward folds are just sums over blocks.
+    """
+    loader = MVPDataLoader(tickers=[])
+    raw_close = df['Close']
+    df = loader.feature_engineering(df, return_raw=True)
+    if df.empty: return None
+    df = CandlestickDetector.add_patterns(df)
+    
+    close = df['Close'].to_numpy(dtype=np.float64)
+    rsi = df['RSI'].to_numpy(dtype=np.float64)
+    next_high = df['High'].shift(-1).to_numpy(dtype=np.float64)
+    next_low = df['Low'].shift(-1).to_numpy(dtype=np.float64)
+    next_close = df['Close'].shift(-1).to_numpy(dtype=np.float64)
+    tradable = ~np.isnan(next_close) # Last bar has no outcome
+    
+    # Shared features: one EMA per span, seeded on the raw history like the loader's EMA_50
+    # (+ EMA200 computed as in strategy_golden_cross)
+    emas = {
+        span: raw_close.ewm(span=span, adjust=False).mean().reindex(df.index).to_numpy()
+        for span in signal_grid['EMA_Span'].dropna().unique()
+    }
+    ema_200 = df['Close'].ewm(span=200, adjust=False).mean().to_numpy()
+    hammer = df['Pattern_Hammer'].to_numpy(dtype=bool)
+    engulfing = df['Pattern_Engulfing'].to_numpy(dtype=bool)
+    
+    signals = np.zeros((len(signal_grid), len(close)), dtype=bool)
+    for i, (name, ema, rsi_th) in enumerate(signal_grid.itertuples(index=False)):
+        if name == "Hammer + RSI Dip":
+            signals[i] = hammer & (rsi < rsi_th) & (close > emas[ema])
+        elif name == "Bullish Engulfing Trend":
+            signals[i] = engulfing & (close > emas[ema])
+        elif name == "RSI < 30 (Pure)":
+            signals[i] = rsi < rsi_th
+        elif name == "Golden Cross (Long Term)":
+            signals[i] = (close > emas[ema]) & (emas[ema] > ema_200)
+    signals &= tradable
+    
+    # Managed outcome for every (TP, SL) pair: (n_tp, n_sl, T) -> (n_tp * n_sl, T)
+    with np.errstate(invalid='ignore'):
+        up = (next_high / close - 1)[None, None, :]
+        down = (next_low / close - 1)[None, None, :]
+        neutral = (next_close / close - 1)[None, None, :]
+    tp = np.asarray(tp_grid, dtype=np.float64)[:, None, None]
+    sl = np.asarray(sl_grid, dtype=np.float64)[None, :, None]
+    loss = np.broadcast_to(down <= -sl, (tp.shape[0], sl.shape[1], len(close))) # Ambiguous (both hit) counts as a loss, as in scan_strategies
+    win = (up >= tp) & ~loss
+    pnl = np.where(win, tp, np.where(loss, -sl, neutral))
+    pnl = np.nan_to_num(pnl).reshape(-1, len(close))
+    win = win.reshape(-1, len(close)).astype(np.float64)
+    loss = loss.reshape(-1, len(close)).astype(np.float64)
+    
+    # Reduce per walk-forward block
+    block_ids = np.searchsorted(block_edges, df.index.values, side='right') - 1
+    n_blocks = len(block_edges) - 1
+    out = {
+        'trades': np.zeros((n_blocks, len(signal_grid))),
+        'wins': np.zeros((n_blocks, pnl.shape[0], len(signal_grid))),
+        'losses': np.zeros((n_blocks, pnl.shape[0], len(signal_grid))),
+        'pnl_sum': np.zeros((n_blocks, pnl.shape[0], len(signal_grid))),
+    }
+    for b in range(n_blocks):
+        cols = block_ids == b
+        if not cols.any(): continue
+        sig_b = signals[:, cols].astype(np.float64).T # (T_b, n_rules)
+        out['trades'][b] = sig_b.sum(axis=0)
+        out['wins'][b] = win[:, cols] @ sig_b
+        out['losses'][b] = loss[:, cols] @ sig_b
+        out['pnl_sum'][b] = pnl[:, cols] @ sig_b
+    return out
+
+def _sweep_chunk(frames, signal_grid, tp_grid, sl_grid, block_edges):
+    """Worker: sums _sweep_ticker results over a chunk of tickers."""
+    total = None
+    for df in frames:
+        try:
+            res = _sweep_ticker(df, signal_grid, tp_grid, sl_grid, block_edges)
+        except Exception as e:
+            logger.error(f"Sweep failed on ticker: {e}")
+            continue
+        if res is None: continue
+        if total is None:
+            total = res
+        else:
+            for k in total: total[k] += res[k]
+    return total
+
+def sweep_strategies(tickers: list = None, full_df=None,
+                     tp_grid=(0.01, 0.015, 0.02, 0.03), sl_grid=(0.005, 0.01, 0.015, 0.02),
+                     rsi_thresholds=(25, 30, 35, 40, 45), ema_spans=(20, 50, 100),
+                     n_folds: int = 4, n_jobs: int = None) -> pd.DataFrame:
+    """
+    Walk-forward parameter sweep over the strategy rules.
+    
+    The history is cut into n_folds + 1 contiguous blocks. Fold k trains on blocks [0..k]
+    (expanding window) and tests on block k + 1. Every TP/SL/RSI/EMA combination is
+    evaluated for every fold in one pass per ticker; tickers run in parallel processes.
+    
+    Returns a tidy table with one row per (Fold, Split, Strategy, EMA_Span, RSI_Threshold, TP, SL).
+    full_df: a MarketPanel or a batch-download DataFrame (downloaded if None).
+    """
+    if full_df is None:
+        tickers = tickers or get_extended_tickers(limit=500000)
+        panel = MVPDataLoader(tickers=tickers, window_size=50).fetch_panel()
+    elif isinstance(full_df, MarketPanel):
+        panel = full_df
+    else:
+        panel = MarketPanel.from_frame(full_df, tickers)
+    if panel.empty:
+        raise ValueError("No data to sweep.")
+    
+    frames = [panel.ticker_frame(t) for t in (tickers or panel.tickers) if t in panel]
+    
+    signal_grid = build_signal_grid(ema_spans, rsi_thresholds)
+    block_edges = np.array_split(panel.index.values, n_folds + 1)
+    block_edges = np.array([blk[0] for blk in block_edges] + [panel.index.values[-1] + np.timedelta64(1, 'D')])
+    
+    # Parallel over tickers (chunked to keep task overhead low)
+    n_jobs = n_jobs or os.cpu_count() or 1
+    chunks = [frames[i::n_jobs] for i in range(n_jobs) if frames[i::n_jobs]]
+    logger.info(f"Sweeping {len(signal_grid) * len(tp_grid) * len(sl_grid)} combinations x {n_folds} folds on {len(frames)} tickers ({len(chunks)} processes)...")
+    
+    total = None
+    if len(chunks) == 1:
+        results = [_sweep_chunk(chunks[0], signal_grid, tp_grid, sl_grid, block_edges)]
+    else:
+        with ProcessPoolExecutor(max_workers=len(chunks)) as pool:
+            results = list(pool.map(_sweep_chunk, chunks, *[[arg] * len(chunks) for arg in (signal_grid, tp_grid, sl_grid, block_edges)]))
+    # Reduce in chunk order (deterministic)
+    for res in results:
+        if res is None: continue
+        if total is None: total = res
+        else:
+            for k in total: total[k] += res[k]
+    if total is None:
+        raise ValueError("No ticker produced sweep results.")
+    
+    # Parameter axes: (tp, sl) flattened in the same order as in _sweep_ticker
+    tp_sl = pd.DataFrame([(tp, sl) for tp in tp_grid for sl in sl_grid], columns=['TP', 'SL'])
+    
+    tables = []
+    for fold in range(n_folds):
+        for split, blocks in (('train', slice(0, fold + 1)), ('test', slice(fold + 1, fold + 2))):
+            trades = total['trades'][blocks].sum(axis=0) # (n_rules,)
+            wins = total['wins'][blocks].sum(axis=0)     # (n_tp_sl, n_rules)
+            losses = total['losses'][blocks].sum(axis=0)
+            pnl_sum = total['pnl_sum'][blocks].sum(axis=0)
+            
+            table = pd.DataFrame({
+                'Fold': fold,
+                'Split': split,
+                'Rule': np.tile(np.arange(len(signal_grid)), len(tp_sl)),
+                'TP_SL': np.repeat(np.arange(len(tp_sl)), len(signal_grid)),
+                'Trades': np.tile(trades, len(tp_sl)).astype(int),
+                'Wins': wins.ravel().astype(int),
+                'Losses': losses.ravel().astype(int),
+                'PnL_Sum': pnl_sum.ravel(),
+            })
+            tables.append(table)
+    
+    results = pd.concat(tables, ignore_index=True)
+    results = results.join(signal_grid, on='Rule').join(tp_sl, on='TP_SL').drop(columns=['Rule', 'TP_SL'])
+    with np.errstate(invalid='ignore', divide='ignore'):
+        results['Win_Rate'] = results['Wins'] / results['Trades']
+        results['Avg_PnL'] = results['PnL_Sum'] / results['Trades']
+    
+    cols = ['Fold', 'Split', 'Strategy', 'EMA_Span', 'RSI_Threshold', 'TP', 'SL', 'Trades', 'Wins', 'Losses', 'Win_Rate', 'Avg_PnL', 'PnL_Sum']
+    return results[cols]
+
+def walk_forward_report(results: pd.DataFrame, min_trades: int = 30) -> pd.DataFrame:
+    """
+    For each fold and strategy, picks the parameter set with the best train Avg_PnL
+    (at least `min_trades` trades) and reports how it did on the following test block.
+    """
+    keys = ['Fold', 'Strategy', 'EMA_Span', 'RSI_Threshold', 'TP', 'SL']
+    train = results[(results['Split'] == 'train') & (results['Trades'] >= min_trades)]
+    best = train.loc[train.groupby(['Fold', 'Strategy'])['Avg_PnL'].idxmax()]
+    test = results[results['Split'] == 'test']
+    # Unused parameters are NaN; pandas merges NaN keys with each other
+    report = best[keys + ['Trades', 'Avg_PnL']].merge(
+        test[keys + ['Trades', 'Win_Rate', 'Avg_PnL']], on=keys, suffixes=('_Train', '_Test'))
+    return report.rename(columns={'Win_Rate': 'Win_Rate_Test'})
+
 if __name__ == "__main__":
-    scan_strategies()
+    if "--sweep" in sys.argv:
+        sweep = sweep_strategies()
+        print(walk_forward_report(sweep).to_string(index=False))
+    else:
+        horizon = next((int(arg.split('=')[1]) for arg in sys.argv if arg.startswith('--horizon=')), 1)
+        scan_strategies(resolve_intraday="--intraday" in sys.argv, horizon=horizon)
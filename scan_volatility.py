@@ -2,7 +2,10 @@ import pandas as pd
 import numpy as np
 import logging
 from src.data_loader import MVPDataLoader
+from src.panel import MarketPanel
+from src.volatility import hv_rank_snapshot, hv_rank_series
 from src.ticker_utils import get_extended_tickers
+from src.metrics import timed
 
 # Configure Logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -17,6 +20,8 @@ class VolatilityEngine:
     - High HV Rank (>80%): Expect Mean Reversion -> Sell Premium (Income).
     - Low HV Rank (<20%): Expect Expansion -> Buy Premium (Sniper).
     """
+    HIGH_RANK = 80
+    LOW_RANK = 20
     
     def __init__(self):
         self.loader = MVPDataLoader()
@@ -26,37 +31,52 @@ class VolatilityEngine:
         
     def calculate_hv_rank(self, df: pd.DataFrame, window: int = 20) -> dict:
         """
-        Calculates HV Rank (0-100).
+        Calculates HV Rank (0-100) for one ticker.
         HV = Annualized Std Dev of Log Returns.
         Rank = Percentile of current HV over last 252 days.
         """
         if len(df) < 260: return None
         
-        # 1. Log Returns
-        df['Log_Ret'] = np.log(df['Close'] / df['Close'].shift(1))
-        
-        # 2. Realized Volatility (Annualized)
-        # Window = 20 (approx 1 month)
-        df['HV'] = df['Log_Ret'].rolling(window=window).std() * np.sqrt(252) * 100
-        
-        current_hv = df['HV'].iloc[-1]
-        
-        # 3. HV Rank (Percentile over last year)
-        last_year_hv = df['HV'].iloc[-252:]
-        rank = (last_year_hv < current_hv).mean() * 100
-        
-        return {
-            'Current_HV': current_hv,
-            'HV_Rank': rank,
-            'High_HV': last_year_hv.max(),
-            'Low_HV': last_year_hv.min()
-        }
+        stats = hv_rank_snapshot(df['Close'].to_numpy(), window=window)
+        return {k: float(stats[k][0]) for k in ('Current_HV', 'HV_Rank', 'High_HV', 'Low_HV')}
+
+    @timed('hv_rank')
+    def hv_rank_table(self, panel: MarketPanel, window: int = 20) -> pd.DataFrame:
+        """
+        HV stats for every ticker of the panel in one vectorized pass over the trailing year.
+        Index: Ticker. Columns: Current_HV, HV_Rank, High_HV, Low_HV (NaN if < 260 bars), Bars.
+        """
+        stats = hv_rank_snapshot(panel.field('Close'), window=window)
+        return pd.DataFrame(stats, index=pd.Index(panel.tickers, name='Ticker'))
+
+    def hv_rank_history(self, panel: MarketPanel, window: int = 20) -> pd.DataFrame:
+        """
+        HV Rank as of every bar (Date x Ticker), NaN until a ticker has 260 bars.
+        The last row matches hv_rank_table.
+        """
+        ranks = hv_rank_series(panel.field('Close'), window=window)
+        return pd.DataFrame(ranks, index=panel.index, columns=panel.tickers)
+
+    def regime_history(self, panel: MarketPanel, window: int = 20) -> pd.DataFrame:
+        """
+        The Signal get_vote would have produced at every bar (Date x Ticker):
+        INCOME / SNIPER_PREP / NEUTRAL. For backtesting the regime logic over history.
+        """
+        ranks = self.hv_rank_history(panel, window).to_numpy()
+        with np.errstate(invalid='ignore'):
+            signals = np.select([ranks > self.HIGH_RANK, ranks < self.LOW_RANK], ['INCOME', 'SNIPER_PREP'], 'NEUTRAL')
+        return pd.DataFrame(signals, index=panel.index, columns=panel.tickers)
 
     def get_vote(self, ticker: str, df: pd.DataFrame) -> dict:
         """
         Generates a Vote based on Volatility Regime.
         """
-        stats = self.calculate_hv_rank(df)
+        return self.vote_from_stats(self.calculate_hv_rank(df))
+
+    def vote_from_stats(self, stats: dict) -> dict:
+        """
+        Maps HV stats (see calculate_hv_rank) to a regime Vote.
+        """
         if not stats:
             return {'Signal': 'NEUTRAL', 'Confidence': 0.0, 'Reason': 'Insufficient Data'}
             
@@ -66,17 +86,17 @@ class VolatilityEngine:
         # A. High Volatility Regime (>80th percentile)
         # Why? Volatility makes mean-reverting.
         # Action: INCOME (Sell Premium)
-        if rank > 80:
+        if rank > self.HIGH_RANK:
             return {
                 'Signal': 'INCOME', # Sell Premium
-                'Confidence': 0.8 + ((rank - 80) / 100), # Higher rank = Higher conf
+                'Confidence': 0.8 + ((rank - self.HIGH_RANK) / 100), # Higher rank = Higher conf
                 'Reason': f"High Volatility (Rank {rank:.0f}%) -> Sell Premium"
             }
             
         # B. Low Volatility Regime (<20th percentile)
         # Why? Volatility is coiled. Expect explosion.
         # Action: SNIPER (Buy Premium / Breakout)
-        elif rank < 20:
+        elif rank < self.LOW_RANK:
             return {
                 'Signal': 'SNIPER_PREP', # Buy Premium
                 'Confidence': 0.70,
@@ -91,37 +111,33 @@ class VolatilityEngine:
                 'Reason': f"Normal Volatility (Rank {rank:.0f}%)"
             }
 
-    def run_scan(self):
+    @timed('income_scan')
+    def run_scan(self, panel: MarketPanel = None):
         """
         Scans universe for Volatility Regimes.
+        panel: pre-loaded market data (e.g. benchmark fixtures); downloaded when omitted.
         """
         results = []
         logger.info(f"Scanning {len(self.universe)} tickers for Income/Vol Setups...")
         
         # Initialize Loader with Universe
-        loader = MVPDataLoader(tickers=self.universe)
-        full_df = loader.fetch_batch_data()
+        if panel is None:
+            loader = MVPDataLoader(tickers=self.universe)
+            panel = loader.fetch_panel()
+        if panel.empty: return results
         
-        # Check if MultiIndex (Ticker, Price) or just (Price,)
-        is_multi = isinstance(full_df.columns, pd.MultiIndex)
+        # HV Rank for the whole universe at once
+        table = self.hv_rank_table(panel)
         
         for t in self.universe:
             try:
-                # Extract Ticker Data
-                if is_multi:
-                    if t in full_df.columns.get_level_values(0):
-                        df = full_df[t].copy()
-                    else:
-                        continue # Ticker not in download
-                else:
-                    # Single ticker case
-                    if len(self.universe) == 1: df = full_df.copy()
-                    else: continue
-                
                 # Validation
-                if df.empty or 'Close' not in df.columns: continue
-
-                vote = self.get_vote(t, df)
+                if t not in table.index or table.at[t, 'Bars'] == 0:
+                    continue # Ticker not in download
+                
+                row = table.loc[t]
+                stats = None if np.isnan(row['HV_Rank']) else row.drop('Bars').to_dict()
+                vote = self.vote_from_stats(stats)
                 
                 # Always append result (for Search visibility)
                 results.append({
@@ -129,7 +145,7 @@ class VolatilityEngine:
                     'Signal': vote['Signal'],
                     'Confidence': vote['Confidence'],
                     'Reason': vote['Reason'],
-                    'HV_Rank': f"{vote.get('Reason').split('(')[1].split(')')[0]}" if '(' in vote['Reason'] else 'N/A'
+                    'HV_Rank': float(stats['HV_Rank']) if stats else None
                 })
             except Exception as e:
                 logger.error(f"Error scanning {t}: {e}")
@@ -1,10 +1,12 @@
 import gymnasium as gym
+from gymnasium.vector import VectorEnv
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 import torch.optim as optim
 import pytorch_lightning as pl
 from torch.distributions import Categorical
+from torch.utils.data import IterableDataset
 import numpy as np
 
 class ActorCritic(nn.Module):
@@ -34,37 +36,133 @@ class ActorCritic(nn.Module):
         
         return action_probs, state_value
 
+class RolloutBuffer:
+    """
+    Preallocated (steps, num_envs) tensor storage for one PPO rollout,
+    plus its GAE advantages and returns.
+    """
+    def __init__(self, rollout_steps, num_envs, obs_dim, device='cpu'):
+        self.rollout_steps = rollout_steps
+        self.num_envs = num_envs
+        
+        shape = (rollout_steps, num_envs)
+        self.states = torch.zeros(shape + (obs_dim,), device=device)
+        self.actions = torch.zeros(shape, dtype=torch.long, device=device)
+        self.log_probs = torch.zeros(shape, device=device)
+        self.rewards = torch.zeros(shape, device=device)
+        self.values = torch.zeros(shape, device=device)
+        self.dones = torch.zeros(shape, device=device)
+        self.advantages = torch.zeros(shape, device=device)
+        self.returns = torch.zeros(shape, device=device)
+        self.last_states = torch.zeros((num_envs, obs_dim), device=device)
+        self.size = 0 # Steps filled (a single env may end the rollout early)
+
+    def reset(self):
+        self.size = 0
+
+    def add(self, state, action, log_prob, reward, value, done):
+        t = self.size
+        self.states[t] = state
+        self.actions[t] = action
+        self.log_probs[t] = log_prob
+        self.rewards[t] = torch.as_tensor(reward, dtype=torch.float32)
+        self.values[t] = value
+        self.dones[t] = torch.as_tensor(done, dtype=torch.float32)
+        self.size += 1
+
+    def load(self, rollout: dict):
+        """Copies a rollout dict (e.g. from RolloutWorkerPool.collect) into the buffer."""
+        self.size = rollout["rewards"].shape[0]
+        for key in ("states", "actions", "log_probs", "rewards", "values", "dones"):
+            getattr(self, key)[:self.size] = rollout[key]
+        self.last_states[:] = rollout["last_states"]
+
+    def compute_gae(self, last_values, gamma=0.99, gae_lambda=0.95):
+        """
+        Generalized Advantage Estimation over the filled steps.
+        last_values: critic estimate for last_states, shape (num_envs,).
+        """
+        gae = torch.zeros_like(last_values)
+        next_values = last_values
+        for t in reversed(range(self.size)):
+            # An episode boundary at t cuts off everything after it
+            mask = 1.0 - self.dones[t]
+            delta = self.rewards[t] + gamma * next_values * mask - self.values[t]
+            gae = delta + gamma * gae_lambda * mask * gae
+            self.advantages[t] = gae
+            next_values = self.values[t]
+        self.returns[:self.size] = self.advantages[:self.size] + self.values[:self.size]
+        
+        adv = self.advantages[:self.size]
+        self.advantages[:self.size] = (adv - adv.mean()) / (adv.std() + 1e-7) # Normalize
+
+    def minibatches(self, batch_size):
+        """Yields shuffled minibatches (dicts of flat tensors) covering the filled steps once."""
+        n = self.size * self.num_envs
+        flat = {
+            "states": self.states[:self.size].flatten(0, 1),
+            "actions": self.actions[:self.size].flatten(),
+            "log_probs": self.log_probs[:self.size].flatten(),
+            "advantages": self.advantages[:self.size].flatten(),
+            "returns": self.returns[:self.size].flatten(),
+        }
+        perm = torch.randperm(n, device=self.states.device)
+        for start in range(0, n, batch_size):
+            idx = perm[start:start + batch_size]
+            # Indexing copies, so the buffer can be refilled while a batch is in flight
+            yield {k: v[idx] for k, v in flat.items()}
+
+class RolloutDataset(IterableDataset):
+    """
+    Feeds PPO minibatches to Lightning: fills the agent's rollout buffer, then yields
+    `ppo_epochs` passes of shuffled minibatches over it before collecting the next rollout.
+    Must be used with num_workers=0 (the environments live in the training process).
+    """
+    def __init__(self, agent, rollouts_per_epoch=1000):
+        self.agent = agent
+        self.rollouts_per_epoch = rollouts_per_epoch
+
+    def __iter__(self):
+        buffer = self.agent.make_buffer()
+        for _ in range(self.rollouts_per_epoch):
+            self.agent.fill_buffer(buffer)
+            for _ in range(self.agent.ppo_epochs):
+                yield from buffer.minibatches(self.agent.batch_size)
+
 class TradingAgent(pl.LightningModule):
     """
     PPO Agent implemented as a LightningModule.
+    Accepts a single gym.Env or a VectorEnv (e.g. VecTradingEnv); vector envs are
+    stepped in lockstep with one forward pass per step for all sub-environments.
+    With a RolloutWorkerPool, experience is collected in subprocesses instead,
+    overlapping environment simulation with the gradient updates.
+    
+    Each rollout is stored in a RolloutBuffer, scored with GAE and reused for
+    `ppo_epochs` passes of `batch_size` minibatches (served by RolloutDataset).
     """
-    def __init__(self, env: gym.Env, lr=1e-3, gamma=0.99, clip_eps=0.2):
+    def __init__(self, env: gym.Env, lr=1e-3, gamma=0.99, clip_eps=0.2, rollout_steps=200, rollout_pool=None,
+                 gae_lambda=0.95, ppo_epochs=4, batch_size=64, rollouts_per_epoch=1000):
         super().__init__()
         self.env = env
         self.gamma = gamma
         self.lr = lr
         self.clip_eps = clip_eps
+        self.rollout_steps = rollout_steps
+        self.rollout_pool = rollout_pool
+        self.gae_lambda = gae_lambda
+        self.ppo_epochs = ppo_epochs
+        self.batch_size = batch_size
+        self.rollouts_per_epoch = rollouts_per_epoch
         
-        self.obs_dim = env.observation_space.shape[0]
-        self.action_dim = env.action_space.n
-        
-        self.model = ActorCritic(self.obs_dim, self.action_dim)
-        
-        # Buffer to store trajectories
-        self.batch_states = []
-        self.batch_actions = []
-        self.batch_log_probs = []
-        self.batch_rewards = []
-        self.batch_dones = []
+        self.is_vector = isinstance(env, VectorEnv)
+        obs_space = env.single_observation_space if self.is_vector else env.observation_space
+        act_space = env.single_action_space if self.is_vector else env.action_space
         
-        # Important: We need manual optimization for PPO usually, unless we restructure data loading.
-        # But for simplicity, we'll collect data in `training_step`? 
-        # Actually PPO typically collects a full rollout then updates.
-        # Lightning usually expects "batch" input in training_step.
+        self.obs_dim = obs_space.shape[0]
+        self.action_dim = act_space.n
         
-        # We will use an "IterableDataset" style approach or just run the environment loop inside the training step
-        # effectively doing "one rollout per step" as a pseudo-batch.
-        self.automatic_optimization = False
+        self.model = ActorCritic(self.obs_dim, self.action_dim)
+        self.rollout_reward = 0.0 # Mean reward per env of the latest rollout (for logging)
 
     def forward(self, x):
         return self.model(x)
@@ -76,90 +174,91 @@ class TradingAgent(pl.LightningModule):
         action = m.sample()
         return action.item(), m.log_prob(action)
 
-    def training_step(self, batch, batch_idx):
-        # NOTE: 'batch' is ignored primarily because we generate our own data from the environment.
-        # In a real rigorous setup, you'd use a DataLoader that yields rollouts.
-        
-        optimizer = self.optimizers()
-        
-        # 1. Collect Rollout
+    def make_buffer(self) -> RolloutBuffer:
+        if self.rollout_pool is not None:
+            num_envs = self.rollout_pool.num_envs
+            rollout_steps = self.rollout_pool.rollout_steps
+        else:
+            num_envs = self.env.num_envs if self.is_vector else 1
+            rollout_steps = self.rollout_steps
+        return RolloutBuffer(rollout_steps, num_envs, self.obs_dim, device=self.device)
+
+    def collect_rollout(self, buffer: RolloutBuffer):
+        """
+        Runs the current policy in self.env and writes the steps into `buffer`.
+        A single env is treated as num_envs=1.
+        """
+        buffer.reset()
         state, _ = self.env.reset()
-        done = False
-        states, actions, log_probs, rewards, values, dones = [], [], [], [], [], []
+        if not self.is_vector:
+            state = state[None]
         
         # Simulate N steps or until done (Truncated for efficiency)
-        rollout_steps = 200 
-        for _ in range(rollout_steps):
-            state_tensor = torch.FloatTensor(state).to(self.device)
-            probs, value = self.model(state_tensor.unsqueeze(0))
+        for _ in range(buffer.rollout_steps):
+            state_tensor = torch.as_tensor(state, dtype=torch.float32, device=self.device)
+            with torch.no_grad():
+                probs, value = self.model(state_tensor)
             m = Categorical(probs)
             action = m.sample()
             
-            next_state, reward, terminated, truncated, _ = self.env.step(action.item())
-            done = terminated or truncated
+            if self.is_vector:
+                next_state, reward, terminated, truncated, _ = self.env.step(action.cpu().numpy())
+                done = np.logical_or(terminated, truncated)
+            else:
+                next_state, reward, terminated, truncated, _ = self.env.step(action.item())
+                next_state = next_state[None]
+                reward = np.array([reward])
+                done = np.array([terminated or truncated])
             
-            states.append(state_tensor)
-            actions.append(action)
-            log_probs.append(m.log_prob(action))
-            rewards.append(reward)
-            values.append(value)
-            dones.append(done)
+            buffer.add(state_tensor, action, m.log_prob(action), reward, value.squeeze(-1), done)
             
             state = next_state
-            if done:
+            # Vector envs autoreset; a single env ends the rollout
+            if not self.is_vector and done[0]:
                 break
-                
-        # 2. Compute Advantages (GAE or simple monte carlo)
-        # Simple Monte Carlo for now
-        returns = []
-        R = 0
-        # If not done, bootstrap from value of last state
-        if not done:
-            with torch.no_grad():
-                _, next_val = self.model(torch.FloatTensor(state).to(self.device).unsqueeze(0))
-                R = next_val.item()
-                
-        for r in reversed(rewards):
-            R = r + self.gamma * R
-            returns.insert(0, R)
-            
-        returns = torch.tensor(returns).to(self.device)
-        returns = (returns - returns.mean()) / (returns.std() + 1e-7) # Normalize
         
-        # 3. PPO Update
-        # Stack
-        states = torch.stack(states)
-        actions = torch.stack(actions)
-        old_log_probs = torch.stack(log_probs).detach()
-        values = torch.cat(values).squeeze()
-        
-        # Calculate advantage
-        # adv = returns - values.detach() # Standard Advantage
+        buffer.last_states[:] = torch.as_tensor(state, dtype=torch.float32)
+
+    def fill_buffer(self, buffer: RolloutBuffer):
+        """Collects the next rollout (inline or from the worker pool) and computes GAE."""
+        if self.rollout_pool is not None:
+            # Take the rollout the workers finished, then let them start the next one
+            # with the current weights while the learner trains on this one.
+            if not self.rollout_pool.pending:
+                self.rollout_pool.sync_weights(self.model)
+                self.rollout_pool.request()
+            buffer.load(self.rollout_pool.collect())
+            self.rollout_pool.sync_weights(self.model)
+            self.rollout_pool.request()
+        else:
+            self.collect_rollout(buffer)
         
-        # Re-evaluate
-        probs, new_values = self.model(states)
+        with torch.no_grad():
+            _, last_values = self.model(buffer.last_states)
+        buffer.compute_gae(last_values.squeeze(-1), self.gamma, self.gae_lambda)
+        self.rollout_reward = buffer.rewards[:buffer.size].sum(0).mean().item()
+
+    def training_step(self, batch, batch_idx):
+        # One clipped PPO update on a minibatch from RolloutDataset
+        probs, new_values = self.model(batch["states"])
         dist = Categorical(probs)
-        new_log_probs = dist.log_prob(actions)
+        new_log_probs = dist.log_prob(batch["actions"])
         entropy = dist.entropy().mean()
         
-        ratios = torch.exp(new_log_probs - old_log_probs.squeeze())
+        ratios = torch.exp(new_log_probs - batch["log_probs"])
         
         # Surrogate Loss
-        advantages = returns - values.detach()
+        advantages = batch["advantages"]
         surr1 = ratios * advantages
         surr2 = torch.clamp(ratios, 1 - self.clip_eps, 1 + self.clip_eps) * advantages
         
         actor_loss = -torch.min(surr1, surr2).mean()
-        critic_loss = F.mse_loss(new_values.squeeze(), returns)
+        critic_loss = F.mse_loss(new_values.squeeze(-1), batch["returns"])
         
         loss = actor_loss + 0.5 * critic_loss - 0.01 * entropy
         
-        optimizer.zero_grad()
-        self.manual_backward(loss)
-        optimizer.step()
-        
         self.log("train_loss", loss, prog_bar=True)
-        self.log("reward", sum(rewards), prog_bar=True)
+        self.log("reward", self.rollout_reward, prog_bar=True) # Mean rollout reward per env
         
         return loss
 
@@ -167,9 +266,8 @@ class TradingAgent(pl.LightningModule):
         return optim.Adam(self.model.parameters(), lr=self.lr)
 
     def train_dataloader(self):
-        # Dummy dataloader just to satisfy Lightning
-        # In a real app we might wrap the environment in an IterableDataset
-        return torch.utils.data.DataLoader([0]*1000) # 1000 pseudo-epochs
+        # Rollouts are generated in-process, so no DataLoader workers and no collation
+        return torch.utils.data.DataLoader(RolloutDataset(self, self.rollouts_per_epoch), batch_size=None, num_workers=0)
 
 if __name__ == "__main__":
     # Test Instantiation
@@ -29,26 +29,94 @@ def calculate_metrics(returns):
         "Max Drawdown": max_drawdown
     }
 
-def run_backtest():
+def run_portfolio_backtest(signals: pd.DataFrame, returns: pd.DataFrame, cost_bps: float = 10.0) -> dict:
+    """
+    Vectorized portfolio backtest over a (time x ticker) universe.
+    
+    signals: target exposure decided at each close (1 = Long, 0 = Cash, -1 = Short).
+             A signal at t is held over the return of t+1.
+    returns: simple returns per bar (NaN where the ticker did not trade).
+    cost_bps: transaction cost charged on every unit of turnover.
+    
+    The portfolio is equal-weighted across tickers with a valid return on each bar.
+    Returns positions, costs, per-ticker and portfolio returns/equity, and a metrics
+    table (calculate_metrics per ticker plus a 'PORTFOLIO' row).
+    """
+    signals, returns = signals.align(returns, join='inner')
+    sig = signals.to_numpy(dtype=np.float64)
+    ret = returns.to_numpy(dtype=np.float64)
+    valid = ~np.isnan(ret)
+    
+    # Position over bar t = signal from bar t-1 (no lookahead); flat where the ticker doesn't trade
+    pos = np.zeros_like(sig)
+    pos[1:] = np.nan_to_num(sig[:-1])
+    pos[~valid] = 0.0
+    
+    turnover = np.abs(np.diff(pos, axis=0, prepend=0.0))
+    costs = turnover * cost_bps / 1e4
+    strat = pos * np.nan_to_num(ret) - costs
+    
+    n_valid = valid.sum(axis=1)
+    port = strat.sum(axis=1) / np.maximum(n_valid, 1)
+    
+    strat_df = pd.DataFrame(strat, index=signals.index, columns=signals.columns)
+    port_s = pd.Series(port, index=signals.index, name='PORTFOLIO')
+    
+    # calculate_metrics is column-wise on a DataFrame
+    metrics = pd.DataFrame(calculate_metrics(strat_df))
+    metrics.loc['PORTFOLIO'] = pd.Series(calculate_metrics(port_s))
+    
+    return {
+        "positions": pd.DataFrame(pos, index=signals.index, columns=signals.columns),
+        "costs": pd.DataFrame(costs, index=signals.index, columns=signals.columns),
+        "returns": strat_df,
+        "equity": (1 + strat_df).cumprod(),
+        "portfolio_returns": port_s,
+        "portfolio_equity": (1 + port_s).cumprod(),
+        "metrics": metrics
+    }
+
+def run_backtest(tickers: list = None, model_path: str = "final_lstm_model.pth", cost_bps: float = 10.0):
     # 1. Load Data (Test Set Only)
-    TICKER = "AAPL"
-    loader = MVPDataLoader(ticker=TICKER)
-    splits = loader.get_data_splits()
-    X_test, y_test = splits['test']
-    test_dates = splits['test_dates']
+    tickers = tickers or ["AAPL"]
+    loader = MVPDataLoader(tickers=tickers)
+    panel = loader.fetch_panel()
+    if panel.empty:
+        logger.error("No data returned from batch download.")
+        return
+    
+    # Per-ticker test sequences (dates aligned to the row each sequence predicts from)
+    X_parts, date_parts, ticker_parts, closes = [], [], [], {}
+    for t in tickers:
+        if t not in panel: continue
+        df = panel.ticker_frame(t)
+        df_eng = loader.feature_engineering(df)
+        if df_eng.empty: continue
+        df_test = df_eng[df_eng.index >= '2024-01-01']
+        X, _ = loader.create_sequences(df_test, 'test')
+        if len(X) == 0: continue
+        X_parts.append(X)
+        date_parts.append(df_test.index[loader.window_size:])
+        ticker_parts.append(np.full(len(X), t, dtype=object))
+        closes[t] = df['Close']
+    
+    if not X_parts:
+        logger.error("No test sequences for any ticker.")
+        return
+    X_test = np.concatenate(X_parts)
     
     # 2. Load Model
     input_dim = X_test.shape[2]
     model = LSTMPredictor(input_dim=input_dim, output_dim=3)
     try:
-        model.load_state_dict(torch.load("final_lstm_model.pth"))
+        model.load_state_dict(torch.load(model_path))
         model.eval()
     except FileNotFoundError:
         logger.error("Model not found! Train first.")
         return
 
-    # 3. Predict
-    logger.info("Generating predictions...")
+    # 3. Predict (one batched pass over every ticker)
+    logger.info(f"Generating predictions for {len(X_parts)} tickers...")
     with torch.no_grad():
         X_tensor = torch.FloatTensor(X_test)
         logits = model(X_tensor)
@@ -57,68 +125,30 @@ def run_backtest():
         
     # 4. Simulate Strategy
     # 0: Down, 1: Neutral, 2: Up
-    # Simple Strategy:
     # Position: 1 (Long) if Up, 0 (Cash) if Neutral/Down. (Long-only for simplicity)
+    pred_df = pd.DataFrame({
+        'Date': np.concatenate(date_parts),
+        'Ticker': np.concatenate(ticker_parts),
+        'Signal': (preds == 2).astype(float)
+    })
+    signals = pred_df.pivot(index='Date', columns='Ticker', values='Signal')
     
-    positions = []
-    for p in preds:
-        if p == 2: # Up
-            positions.append(1.0)
-        elif p == 0: # Down
-            positions.append(0.0) # Cash
-        else:
-            positions.append(0.0) # Neutral -> Cash (conservative)
-            
-    positions = np.array(positions)
-    
-    # Calculate Returns
-    # Market Returns (Test Set)
-    # Reconstruct close prices to get returns? 
-    # splits data is scaled features.
-    # We need separate access to Raw Returns for the test period.
-    # MVPDataLoader engineered `Log_Return`.
-    # Let's align carefully. create_sequences creates aligned X, y.
-    # The `y` is the target direction, not the return value.
-    # We need the actual returns corresponding to the NEXT STEP of each X input.
-    # The `create_sequences` usually aligns X[t] with y[t] where y[t] is target derived from Return[t+1].
-    
-    # Let's fetch the raw test dataframe again to get Returns
-    # This is a bit inefficient but accurate if we rely on dates.
-    # The `test_dates` attribute allows us to map back.
-    
-    # Actually, simpler: Re-fetch feature engineered df and slice test
-    df = loader.fetch_data()
-    df_eng = loader.feature_engineering(df)
-    test_mask = (df_eng.index >= '2024-01-01')
-    df_test = df_eng[test_mask].iloc[loader.window_size:] # trimmed by window
-    
-    market_returns = df_test['Log_Return'].shift(-1).dropna().values # Return of taking action at t, realized at t+1?
-    # X[t] predicts t+1. So if we trade at t (Close), we get Return[t+1].
-    # df_eng['Log_Return'] is log(Close_t / Close_t-1).
-    # So `Log_Return`.shift(-1) is log(Close_t+1 / Close_t). Correct.
-    
-    # Align lengths
-    n = min(len(positions), len(market_returns))
-    positions = positions[:n]
-    market_returns = market_returns[:n]
-    dates = df_test.index[:n]
-    
-    strategy_returns = positions * market_returns
+    # Market Returns (simple, close-to-close) over the same dates
+    returns = pd.DataFrame(closes).pct_change().reindex(signals.index)
     
-    # 5. Metrics & Plotting
-    # Convert log returns to simple for equity curve
-    strat_equity = np.exp(np.cumsum(strategy_returns))
-    market_equity = np.exp(np.cumsum(market_returns))
+    result = run_portfolio_backtest(signals.fillna(0.0), returns, cost_bps=cost_bps)
+    market = run_portfolio_backtest(pd.DataFrame(1.0, index=signals.index, columns=signals.columns), returns, cost_bps=0.0)
     
+    # 5. Metrics & Plotting
     df_res = pd.DataFrame({
-        "Strategy": strat_equity,
-        "Market (Buy&Hold)": market_equity
-    }, index=dates)
+        "Strategy": result['portfolio_equity'],
+        "Market (Buy&Hold)": market['portfolio_equity']
+    })
     
     # Save Plot
     plt.figure(figsize=(10, 6))
     plt.plot(df_res.index, df_res['Strategy'], label='AI Agent')
-    plt.plot(df_res.index, df_res['Market (Buy&Hold)'], label='Market (AAPL)', alpha=0.6)
+    plt.plot(df_res.index, df_res['Market (Buy&Hold)'], label=f'Market ({len(signals.columns)} tickers, EW)', alpha=0.6)
     plt.title("Backtest Result: AI vs Market (2024)")
     plt.ylabel("Portfolio Value (Normalized)")
     plt.legend()
@@ -128,12 +158,13 @@ def run_backtest():
     plt.savefig("frontend/public/backtest_chart.png")
     plt.close()
     
-    metrics_strat = calculate_metrics(pd.Series(strategy_returns))
-    metrics_mkt = calculate_metrics(pd.Series(market_returns))
+    metrics_strat = result['metrics'].loc['PORTFOLIO']
+    metrics_mkt = market['metrics'].loc['PORTFOLIO']
     
     logger.info("=== Backtest Results (2024) ===")
     logger.info(f"AI Agent: Return={metrics_strat['Total Return']:.2%}, Sharpe={metrics_strat['Sharpe Ratio']:.2f}, DD={metrics_strat['Max Drawdown']:.2%}")
     logger.info(f"Market:   Return={metrics_mkt['Total Return']:.2%}, Sharpe={metrics_mkt['Sharpe Ratio']:.2f}, DD={metrics_mkt['Max Drawdown']:.2%}")
+    return result
 
 if __name__ == "__main__":
     run_backtest()
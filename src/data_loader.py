@@ -2,10 +2,13 @@ import yfinance as yf
 import pandas as pd
 import numpy as np
 import logging
+import time
 from typing import Tuple, Dict, Optional
 from sklearn.preprocessing import StandardScaler
 from ta.momentum import RSIIndicator
 from ta.trend import MACD
+from .panel import MarketPanel
+from .metrics import METRICS, span, timed
 # from .tda_features import FeatureProcessor # TDA disabled for Massive Scale speed
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -32,11 +35,28 @@ class MVPDataLoader:
         # TDA Processor (can be heavy, may want to disable for massive data if too slow)
         # self.tda_processor = FeatureProcessor(embedding_dim=3, embedding_delay=1) # Disabled
 
+    @timed('fetch_batch')
     def fetch_batch_data(self) -> pd.DataFrame:
         """
         Downloads data for ALL tickers in parallel (Much faster).
         Returns a MultiIndex DataFrame (Price, Ticker).
         """
+        full_df = self._download_batch()
+        full_df.ffill(inplace=True)
+        return full_df
+
+    @timed('fetch_batch')
+    def fetch_panel(self) -> MarketPanel:
+        """
+        Same download as fetch_batch_data, packed into a columnar MarketPanel
+        (validity mask taken before forward-filling).
+        """
+        df = self._download_batch()
+        with span('build_panel'):
+            return MarketPanel.from_frame(df, self.tickers)
+
+    def _download_batch(self) -> pd.DataFrame:
+        """Chunked yf.download of self.tickers, concatenated but not forward-filled."""
         if not self.tickers: return pd.DataFrame()
         logger.info(f"Batch downloading {len(self.tickers)} tickers (2018-2025)...")
         
@@ -49,19 +69,21 @@ class MVPDataLoader:
             logger.info(f"Downloading chunk {i}-{i+len(chunk)}...")
             try:
                 # Group by Ticker to make extraction easier: df[Ticker] -> DataFrame
+                start = time.perf_counter()
                 df = yf.download(chunk, start="2018-01-01", end="2025-01-01", group_by='ticker', auto_adjust=True, progress=False, threads=True)
+                METRICS.observe_stage('fetch_batch_chunk', time.perf_counter() - start)
+                METRICS.inc('fetch_total', len(chunk), source='batch', result='empty' if df.empty else 'ok')
                 if not df.empty:
                     all_dfs.append(df)
             except Exception as e:
                 logger.error(f"Failed chunk {i}: {e}")
+                METRICS.inc('fetch_total', len(chunk), source='batch', result='error')
         
         if not all_dfs: return pd.DataFrame()
         
         # Concat along columns (axis=1) if they are wide (Price, Ticker) format... 
         # Wait, concat(axis=1) might align dates automatically.
-        full_df = pd.concat(all_dfs, axis=1)
-        full_df.ffill(inplace=True)
-        return full_df
+        return pd.concat(all_dfs, axis=1)
 
     def process_single_ticker_data(self, df_ticker: pd.DataFrame) -> pd.DataFrame:
         """Helper to process a single ticker's worth of data from the batch."""
@@ -219,32 +241,20 @@ class MVPDataLoader:
         all_X_test, all_y_test = [], []
         
         # 1. Fetch All Data (Batch)
-        full_df = self.fetch_batch_data()
+        panel = self.fetch_panel()
         
-        if full_df.empty:
+        if panel.empty:
             raise ValueError("No data returned from batch download.")
             
         # 2. Iterate and Process
-        # Handle Single Ticker vs Multi-Ticker structure from yfinance
-        is_multi_index = isinstance(full_df.columns, pd.MultiIndex)
-        
         processed_count = 0
         
         for t in self.tickers:
             try:
-                # Extract Ticker Data
-                if is_multi_index:
-                    if t in full_df.columns.get_level_values(0):
-                        df = full_df[t].copy()
-                    else:
-                        continue # Ticker failed to download
-                else:
-                    # If single ticker and not multi-index, the whole DF is that ticker
-                    # But verify we only expected 1 ticker
-                    if len(self.tickers) == 1:
-                        df = full_df.copy()
-                    else:
-                        continue 
+                # Extract Ticker Data (zero-copy view)
+                if t not in panel:
+                    continue # Ticker failed to download
+                df = panel.ticker_frame(t)
 
                 # Process
                 df = self.feature_engineering(df)
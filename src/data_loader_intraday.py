@@ -4,6 +4,7 @@ import numpy as np
 import logging
 import time
 from typing import Optional, Dict
+from .metrics import METRICS, timed
 
 # Configure Logger
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
@@ -18,6 +19,7 @@ class IntradayDataLoader:
     def __init__(self):
         self.cache = {}
 
+    @timed('fetch_intraday')
     def fetch_data(self, ticker: str, interval: str = '15m', period: str = '59d') -> Optional[pd.DataFrame]:
         """
         Fetches intraday data for a single ticker.
@@ -40,6 +42,7 @@ class IntradayDataLoader:
             logger.info(f"Fetching {interval} data for {ticker} (Period: {period})...")
             
             # Download
+            start = time.perf_counter()
             df = yf.download(
                 tickers=ticker,
                 period=period,
@@ -47,9 +50,11 @@ class IntradayDataLoader:
                 progress=False,
                 threads=False # Single thread to avoid rate limits on loop
             )
+            METRICS.observe_fetch('intraday', ticker, time.perf_counter() - start)
             
             if df is None or df.empty:
                 logger.warning(f"No data found for {ticker}")
+                METRICS.inc('fetch_total', source='intraday', result='empty')
                 return None
                 
             # Formatting
@@ -73,6 +78,7 @@ class IntradayDataLoader:
             missing = [c for c in required_cols if c not in df.columns]
             if missing:
                 logger.error(f"Missing columns {missing} for {ticker}")
+                METRICS.inc('fetch_total', source='intraday', result='error')
                 return None
             
             # Clean Data
@@ -83,15 +89,32 @@ class IntradayDataLoader:
             
             if len(df) < 50:
                 logger.warning(f"Insufficient data points ({len(df)}) for {ticker}")
+                METRICS.inc('fetch_total', source='intraday', result='short')
                 return None
                 
             logger.info(f"Successfully loaded {len(df)} rows for {ticker}")
+            METRICS.inc('fetch_total', source='intraday', result='ok')
             return df
             
         except Exception as e:
             logger.error(f"Failed to fetch {ticker}: {e}")
+            METRICS.inc('fetch_total', source='intraday', result='error')
             return None
 
+    def get_cached(self, ticker: str, interval: str = '15m', period: str = '59d') -> Optional[pd.DataFrame]:
+        """
+        Like fetch_data, but downloads each (ticker, interval, period) only once per loader.
+        Meant for historical lookups (e.g. backtests); live scans should call fetch_data.
+        The returned frame has a sorted DatetimeIndex.
+        """
+        key = (ticker, interval, period)
+        METRICS.cache('intraday', key in self.cache)
+        if key not in self.cache:
+            df = self.fetch_data(ticker, interval=interval, period=period)
+            self.cache[key] = df.sort_index() if df is not None else None
+        return self.cache[key]
+
+    @timed('indicators')
     def add_technical_indicators(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Adds 'Sniper' features: VWAP, RSI, ATR.
@@ -0,0 +1,85 @@
+import gzip
+import json
+import logging
+
+logger = logging.getLogger('Encoding')
+
+# Optional fast paths
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+FORMATS = ('rows', 'columnar')
+
+def _default(obj):
+    # NumPy / pandas scalars and timestamps from the experts
+    if hasattr(obj, 'item'):
+        return obj.item()
+    return str(obj)
+
+def dumps_json(obj) -> bytes:
+    """Compact JSON bytes (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, separators=(',', ':')).encode()
+
+def pack(obj, media_type: str = JSON) -> bytes:
+    if media_type == MSGPACK:
+        return msgpack.packb(obj, default=_default, use_bin_type=True)
+    return dumps_json(obj)
+
+def negotiate_media(accept: str) -> str:
+    """MessagePack if the client asks for it and msgpack is installed, else JSON."""
+    accept = accept or ''
+    if msgpack is not None and ('application/msgpack' in accept or 'application/x-msgpack' in accept):
+        return MSGPACK
+    return JSON
+
+def negotiate_encoding(accept_encoding: str):
+    """'br' / 'gzip' / None from an Accept-Encoding header."""
+    accept_encoding = accept_encoding or ''
+    if brotli is not None and 'br' in accept_encoding:
+        return 'br'
+    if 'gzip' in accept_encoding:
+        return 'gzip'
+    return None
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=5)
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=6)
+    return data
+
+def history_rows(history) -> list:
+    """Columnar sparkline {'Time': [...], 'Close': [...], 'Volume': [...]} -> list of points."""
+    if not history or isinstance(history, list):
+        return history or []
+    keys = list(history)
+    return [dict(zip(keys, values)) for values in zip(*history.values())]
+
+def decisions_rows(decisions: list) -> list:
+    """Decisions as the dashboard expects them (one dict per ticker, History as points)."""
+    return [dict(d, History=history_rows(d['History'])) if 'History' in d else d for d in decisions]
+
+def decisions_columnar(decisions: list) -> dict:
+    """
+    Column-oriented decisions: {'Ticker': [...], 'Action': [...], ..., 'History': [{'Time': [...], ...}]}.
+    Keys are the union over all decisions (missing values are None).
+    """
+    columns = {}
+    for d in decisions:
+        for k in d:
+            columns.setdefault(k, None)
+    return {k: [d.get(k) for d in decisions] for k in columns}
@@ -1,10 +1,18 @@
 import gymnasium as gym
 from gymnasium import spaces
+from gymnasium.vector import VectorEnv
+from gymnasium.vector.utils import batch_space
 import numpy as np
 import pandas as pd
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 from .tda_features import FeatureProcessor
 
+try:
+    from gymnasium.vector import AutoresetMode
+    SAME_STEP_AUTORESET = AutoresetMode.SAME_STEP
+except ImportError: # gymnasium < 1.1 has no autoreset modes
+    SAME_STEP_AUTORESET = "SameStep"
+
 class TradingEnv(gym.Env):
     """
     A custom Trading Environment that follows gymnasium interface.
@@ -12,13 +20,16 @@ class TradingEnv(gym.Env):
     """
     metadata = {'render.modes': ['human']}
 
-    def __init__(self, df: pd.DataFrame, initial_balance=10000.0, window_size=50, tda_config=None):
+    def __init__(self, df: pd.DataFrame, initial_balance=10000.0, window_size=50, tda_config=None, precompute=False):
         super(TradingEnv, self).__init__()
         
         self.df = df
         self.initial_balance = initial_balance
         self.window_size = window_size
         
+        # Close prices as a contiguous array (avoids pandas indexing on every step)
+        self.prices = self._extract_prices(df)
+        
         # Config for Feature Processor
         if tda_config is None:
             tda_config = {"embedding_dim": 3, "embedding_delay": 1, "max_homology_dim": 1}
@@ -49,6 +60,37 @@ class TradingEnv(gym.Env):
         self.current_step = window_size
         self.net_worth_history = []
         
+        # Optional: run TDA once for every window up front.
+        # Row i holds the features of prices[i - window_size : i], so a step is just an index lookup.
+        self.market_obs = self._precompute_market_features() if precompute else None
+        
+    @staticmethod
+    def _extract_prices(df) -> np.ndarray:
+        # df structure: if MultiIndex, we assume single ticker passed in.
+        # If DataFrame has 'Close' column, use it.
+        if isinstance(df, pd.DataFrame):
+            price_data = df['Close'].values if 'Close' in df.columns else df.iloc[:, 0].values
+        else:
+            price_data = np.asarray(df) # If series
+        return np.ascontiguousarray(price_data, dtype=np.float64)
+
+    def _precompute_market_features(self) -> np.ndarray:
+        """
+        Computes the TDA feature vector for every reachable step.
+        Returns a contiguous float32 array of shape (len(prices), n_features).
+        """
+        n_steps = len(self.prices)
+        features = np.zeros((n_steps, self.n_features), dtype=np.float32)
+        for step in range(self.window_size, n_steps):
+            features[step] = self.processor.process(self.prices[step - self.window_size : step])
+        return features
+
+    def _market_features(self) -> np.ndarray:
+        if self.market_obs is not None:
+            return self.market_obs[self.current_step]
+        window = self.prices[self.current_step - self.window_size : self.current_step]
+        return self.processor.process(window)
+
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
         self.balance = self.initial_balance
@@ -63,18 +105,8 @@ class TradingEnv(gym.Env):
         return observation, info
 
     def _next_observation(self):
-        # get window of close prices
-        # df structure: if MultiIndex, we assume single ticker passed in.
-        # If DataFrame has 'Close' column, use it.
-        if isinstance(self.df, pd.DataFrame):
-            price_data = self.df['Close'].values if 'Close' in self.df.columns else self.df.iloc[:, 0].values
-        else:
-            price_data = self.df # If series
-            
-        window = price_data[self.current_step - self.window_size : self.current_step]
-        
-        # TDA Features
-        tda_feats = self.processor.process(window)
+        # TDA Features (precomputed lookup or computed on the current window)
+        tda_feats = self._market_features()
         
         # Account info
         # Normalize balance (log scale or relative)
@@ -82,18 +114,15 @@ class TradingEnv(gym.Env):
         balance_feat = np.log1p(self.balance)
         position_feat = self.position # Simply number of shares, better would be % of portfolio
         
-        obs = np.concatenate((tda_feats, [balance_feat, position_feat]))
-        return obs.astype(np.float32)
+        obs = np.empty(self.obs_shape, dtype=np.float32)
+        obs[:self.n_features] = tda_feats
+        obs[self.n_features] = balance_feat
+        obs[self.n_features + 1] = position_feat
+        return obs
 
     def step(self, action):
         # Get current price
-        # df assumption similar to _next_observation
-        if isinstance(self.df, pd.DataFrame):
-             price_series = self.df['Close'] if 'Close' in self.df.columns else self.df.iloc[:, 0]
-        else:
-             price_series = self.df
-             
-        current_price = float(price_series.iloc[self.current_step])
+        current_price = float(self.prices[self.current_step])
         prev_net_worth = self.balance + self.position * current_price
         
         # Execute Action
@@ -127,7 +156,7 @@ class TradingEnv(gym.Env):
         # Advance step
         self.current_step += 1
         
-        terminated = self.current_step >= len(price_series) - 1
+        terminated = self.current_step >= len(self.prices) - 1
         truncated = False
         
         obs = self._next_observation() if not terminated else np.zeros(self.obs_shape, dtype=np.float32)
@@ -136,5 +165,109 @@ class TradingEnv(gym.Env):
         return obs, reward, terminated, truncated, info
 
     def render(self, mode='human', close=False):
-        current_net_worth = self.balance + self.position * self.df.iloc[self.current_step]['Close']
+        current_net_worth = self.balance + self.position * self.prices[self.current_step]
         print(f'Step: {self.current_step}, Net Worth: {current_net_worth:.2f}')
+
+
+class VecTradingEnv(VectorEnv):
+    """
+    Vectorized TradingEnv following gymnasium's vector API.
+    Simulates N tickers (or N episodes of one ticker) in lockstep:
+    balance, position and prices live in NumPy arrays of shape (num_envs,).
+    Market features are precomputed once per DataFrame (see TradingEnv(precompute=True)).
+    Finished sub-environments are reset in the same step.
+    """
+    metadata = {'autoreset_mode': SAME_STEP_AUTORESET}
+
+    def __init__(self, dfs: List[pd.DataFrame], initial_balance=10000.0, window_size=50, tda_config=None, random_start=False):
+        super().__init__()
+        
+        self.num_envs = len(dfs)
+        self.initial_balance = initial_balance
+        self.window_size = window_size
+        self.random_start = random_start # Start episodes at random offsets (useful for N episodes of one df)
+        
+        # Precompute features once per distinct DataFrame
+        templates = {}
+        for df in dfs:
+            if id(df) not in templates:
+                templates[id(df)] = TradingEnv(df, initial_balance, window_size, tda_config, precompute=True)
+        envs = [templates[id(df)] for df in dfs]
+        
+        self.n_features = envs[0].n_features
+        self.lengths = np.array([len(env.prices) for env in envs])
+        
+        # Padded (num_envs, max_len) prices and (num_envs, max_len, n_features) features
+        max_len = self.lengths.max()
+        self.prices = np.zeros((self.num_envs, max_len), dtype=np.float64)
+        self.market_obs = np.zeros((self.num_envs, max_len, self.n_features), dtype=np.float32)
+        for i, env in enumerate(envs):
+            self.prices[i, :self.lengths[i]] = env.prices
+            self.market_obs[i, :self.lengths[i]] = env.market_obs
+        
+        self.single_observation_space = envs[0].observation_space
+        self.single_action_space = envs[0].action_space
+        self.observation_space = batch_space(self.single_observation_space, self.num_envs)
+        self.action_space = batch_space(self.single_action_space, self.num_envs)
+        
+        # State variables
+        self.env_ids = np.arange(self.num_envs)
+        self.balance = np.full(self.num_envs, initial_balance, dtype=np.float64)
+        self.position = np.zeros(self.num_envs, dtype=np.float64)
+        self.current_step = np.full(self.num_envs, window_size + 1, dtype=np.int64)
+
+    def _reset_envs(self, mask: np.ndarray):
+        self.balance[mask] = self.initial_balance
+        self.position[mask] = 0.0
+        if self.random_start:
+            # Leave at least one step before termination
+            high = np.maximum(self.lengths[mask] - 2, self.window_size + 2)
+            self.current_step[mask] = self.np_random.integers(self.window_size + 1, high)
+        else:
+            self.current_step[mask] = self.window_size + 1
+
+    def _next_observation(self) -> np.ndarray:
+        obs = np.empty((self.num_envs, self.n_features + 2), dtype=np.float32)
+        obs[:, :self.n_features] = self.market_obs[self.env_ids, self.current_step]
+        obs[:, self.n_features] = np.log1p(self.balance)
+        obs[:, self.n_features + 1] = self.position
+        return obs
+
+    def reset(self, seed=None, options=None):
+        super().reset(seed=seed)
+        self._reset_envs(np.ones(self.num_envs, dtype=bool))
+        return self._next_observation(), {}
+
+    def step(self, actions):
+        actions = np.asarray(actions)
+        current_price = self.prices[self.env_ids, self.current_step]
+        prev_net_worth = self.balance + self.position * current_price
+        
+        # Same unit trading rules as TradingEnv
+        unit = 1
+        buy = (actions == 1) & (self.balance >= current_price * unit)
+        sell = (actions == 2) & (self.position >= unit)
+        self.balance += (sell.astype(np.float64) - buy) * current_price * unit
+        self.position += (buy.astype(np.float64) - sell) * unit
+        
+        current_net_worth = self.balance + self.position * current_price
+        
+        # Reward = Log Return of Net Worth
+        rewards = np.zeros(self.num_envs, dtype=np.float64)
+        valid = prev_net_worth > 0
+        rewards[valid] = np.log(current_net_worth[valid] / prev_net_worth[valid])
+        
+        # Advance step
+        self.current_step += 1
+        
+        terminated = self.current_step >= self.lengths - 1
+        truncated = np.zeros(self.num_envs, dtype=bool)
+        infos = {"net_worth": current_net_worth, "price": current_price}
+        
+        if terminated.any():
+            # Terminal observations are zeros (as in TradingEnv); reset those envs in place
+            infos["final_obs"] = np.zeros((self.num_envs, self.n_features + 2), dtype=np.float32)
+            infos["_final_obs"] = terminated
+            self._reset_envs(terminated)
+        
+        return self._next_observation(), rewards, terminated, truncated, infos
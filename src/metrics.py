@@ -0,0 +1,186 @@
+import cProfile
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+logger = logging.getLogger('Metrics')
+
+# Optional: pyinstrument gives a readable call tree; cProfile is the fallback
+try:
+    import pyinstrument
+except ImportError:
+    pyinstrument = None
+
+PREFIX = 'agent'
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0) # Seconds
+PROFILE_DIR = "profiles"
+
+class Histogram:
+    """Cumulative-bucket histogram (Prometheus semantics): counts per upper bound, sum, count."""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # Last slot = +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Metrics:
+    """
+    In-process metrics for the scan pipeline, rendered in the Prometheus text format.
+
+    - stage histograms: time per pipeline stage (span / timed)
+    - per-ticker fetch latency: count, total and last duration per ticker (no buckets, to keep
+      a 200+ ticker universe to a few series each)
+    - counters: cache hits/misses, fetch outcomes, ...
+    All updates take one lock; they are cheap next to what they measure.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {} # stage -> Histogram
+        self.fetches = {} # (source, ticker) -> [count, total, last]
+        self.counters = {} # (name, ((label, value), ...)) -> count
+
+    def observe_stage(self, stage: str, seconds: float):
+        with self._lock:
+            hist = self.stages.get(stage)
+            if hist is None:
+                hist = self.stages[stage] = Histogram()
+            hist.observe(seconds)
+
+    def observe_fetch(self, source: str, ticker: str, seconds: float):
+        with self._lock:
+            stats = self.fetches.setdefault((source, ticker), [0, 0.0, 0.0])
+            stats[0] += 1
+            stats[1] += seconds
+            stats[2] = seconds
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def cache(self, cache: str, hit: bool):
+        self.inc('cache_requests_total', cache=cache, result='hit' if hit else 'miss')
+
+    def hit_rates(self) -> dict:
+        """{cache: hit rate} from the cache counters."""
+        totals = {}
+        for (name, labels), value in list(self.counters.items()):
+            if name == 'cache_requests_total':
+                labels = dict(labels)
+                hits, total = totals.get(labels['cache'], (0, 0))
+                totals[labels['cache']] = (hits + value * (labels['result'] == 'hit'), total + value)
+        return {cache: hits / total for cache, (hits, total) in totals.items() if total}
+
+    def reset(self):
+        with self._lock:
+            self.stages, self.fetches, self.counters = {}, {}, {}
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self._lock:
+            stages = {k: (list(h.counts), h.sum, h.count) for k, h in self.stages.items()}
+            fetches = {k: list(v) for k, v in self.fetches.items()}
+            counters = dict(self.counters)
+
+        lines = []
+        name = f"{PREFIX}_stage_seconds"
+        lines += [f"# HELP {name} Time spent per scan pipeline stage.", f"# TYPE {name} histogram"]
+        for stage, (counts, total, count) in sorted(stages.items()):
+            running = 0
+            for bound, n in zip(BUCKETS + ('+Inf',), counts):
+                running += n
+                lines.append(f'{name}_bucket{{stage="{stage}",le="{bound}"}} {running}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {total}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {count}')
+
+        name = f"{PREFIX}_fetch_seconds"
+        lines += [f"# HELP {name} Market data download time per ticker.", f"# TYPE {name} summary"]
+        for (source, ticker), (count, total, _) in sorted(fetches.items()):
+            labels = f'source="{source}",ticker="{_escape(ticker)}"'
+            lines.append(f'{name}_sum{{{labels}}} {total}')
+            lines.append(f'{name}_count{{{labels}}} {count}')
+        name = f"{PREFIX}_fetch_last_seconds"
+        lines += [f"# HELP {name} Duration of the latest download per ticker.", f"# TYPE {name} gauge"]
+        for (source, ticker), (_, _, last) in sorted(fetches.items()):
+            lines.append(f'{name}{{source="{source}",ticker="{_escape(ticker)}"}} {last}')
+
+        by_name = {}
+        for (metric, labels), value in counters.items():
+            by_name.setdefault(metric, []).append((labels, value))
+        for metric, series in sorted(by_name.items()):
+            name = f"{PREFIX}_{metric}"
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in sorted(series):
+                label_text = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        rates = self.hit_rates()
+        name = f"{PREFIX}_cache_hit_ratio"
+        lines += [f"# HELP {name} Cache hits / requests since start.", f"# TYPE {name} gauge"]
+        lines += [f'{name}{{cache="{cache}"}} {rate}' for cache, rate in sorted(rates.items())]
+        return "\n".join(lines) + "\n"
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+METRICS = Metrics()
+
+@contextmanager
+def span(stage: str):
+    """Times the block into the `stage` histogram (also when it raises)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.observe_stage(stage, time.perf_counter() - start)
+
+def timed(stage: str):
+    """Decorator form of span()."""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+@contextmanager
+def profiled(name: str, out_dir: str = PROFILE_DIR):
+    """
+    Profiles the block and writes it to out_dir: an HTML call tree with pyinstrument when
+    installed, otherwise a cProfile .prof (open with snakeviz / pstats).
+    Yields a dict whose 'path' is set once the block finishes.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    result = {'path': None}
+    if pyinstrument is not None:
+        profiler = pyinstrument.Profiler()
+        profiler.start()
+        try:
+            yield result
+        finally:
+            profiler.stop()
+            result['path'] = os.path.join(out_dir, f"{name}.html")
+            with open(result['path'], 'w') as f:
+                f.write(profiler.output_html())
+    else:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield result
+        finally:
+            profiler.disable()
+            result['path'] = os.path.join(out_dir, f"{name}.prof")
+            profiler.dump_stats(result['path'])
+    logger.info(f"Profile written to {result['path']}")
@@ -0,0 +1,292 @@
+import logging
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from itertools import product
+from typing import Dict, List, Sequence
+import numpy as np
+from .trade_records import TradeRecord
+
+logger = logging.getLogger('MultiPortfolio')
+
+# Same ladder as SimulationEngine.update_level / _check_survival
+LEVELS = ["Novice (Risk Taker)", "Apprentice", "Pro Trader", "Grandmaster", "Wolf of Wall Street"]
+LEVEL_SCORES = np.array([0, 50, 100, 200, 500]) # Score needed for each level
+DEMOTE = np.array([0, 0, 1, 2, 2]) # Level after a margin call (Wolf / Grandmaster -> Pro)
+NOVICE = 0
+
+@dataclass(frozen=True)
+class PortfolioConfig:
+    """
+    Rules for one simulated portfolio. The defaults are SimulationEngine's hardcoded rules,
+    so a default config trades exactly like the single-portfolio engine.
+    """
+    name: str
+    initial_balance: float = 10000.0
+    thresholds: tuple = (0.10, 0.40, 0.70, 0.85, 0.90) # Min confidence to buy, per level (LEVELS order)
+    allocation: float = 0.20 # Fraction of balance per entry
+    take_profit: float = 1.0 # % gain that closes a position
+    stop_loss: float = -0.5 # % loss that closes a position
+    tp_reward: int = 1
+    sl_reward: int = -4
+    volume_boost: float = 0.10 # Added to confidence when the reason mentions Volume
+
+def portfolio_grid(allocations=(0.10, 0.20, 0.30), take_profits=(1.0, 2.0), stop_losses=(-0.5, -1.0),
+                   threshold_sets: Dict[str, tuple] = None, **kwargs) -> List[PortfolioConfig]:
+    """Configs for every combination of the given parameters (names like 'a20-tp1.0-sl0.5')."""
+    threshold_sets = threshold_sets or {'': PortfolioConfig.thresholds}
+    configs = []
+    for (label, thresholds), alloc, tp, sl in product(threshold_sets.items(), allocations, take_profits, stop_losses):
+        name = f"{label + '-' if label else ''}a{round(alloc * 100)}-tp{tp}-sl{abs(sl)}"
+        configs.append(PortfolioConfig(name, thresholds=tuple(thresholds), allocation=alloc,
+                                       take_profit=tp, stop_loss=sl, **kwargs))
+    return configs
+
+class MultiPortfolioEngine:
+    """
+    Runs many paper portfolios side by side on the same decision stream
+    (strategy / level-threshold experiments), with all state in NumPy arrays:
+
+    - cash, balance, score, level, alive: shape (portfolio,)
+    - qty, avg_price: shape (portfolio x ticker), over a ticker universe that grows as tickers appear
+    - per-portfolio rules (thresholds per level, allocation, TP/SL, rewards) as arrays too
+
+    One market tick updates every portfolio with a handful of array operations; only
+    the trade records themselves are built per event. State is in memory only.
+    """
+    def __init__(self, configs: Sequence[PortfolioConfig], history_limit: int = 100, capacity: int = 64):
+        names = [c.name for c in configs]
+        if len(set(names)) != len(names):
+            raise ValueError("Portfolio names must be unique.")
+        self.configs = list(configs)
+        self.ids = {name: p for p, name in enumerate(names)}
+        self.history_limit = history_limit
+        self._lock = threading.Lock() # Ticks are applied by one writer at a time
+        self.ticks = 0
+
+        # 1. Rules
+        cfg = self.configs
+        self.initial = np.array([c.initial_balance for c in cfg], dtype=np.float64)
+        self.thresholds = np.array([c.thresholds for c in cfg], dtype=np.float64) # (P x level)
+        self.allocation = np.array([c.allocation for c in cfg], dtype=np.float64)
+        self.take_profit = np.array([c.take_profit for c in cfg], dtype=np.float64)
+        self.stop_loss = np.array([c.stop_loss for c in cfg], dtype=np.float64)
+        self.tp_reward = np.array([c.tp_reward for c in cfg], dtype=np.int64)
+        self.sl_reward = np.array([c.sl_reward for c in cfg], dtype=np.int64)
+        self.volume_boost = np.array([c.volume_boost for c in cfg], dtype=np.float64)
+
+        # 2. Ticker universe
+        self.tickers: List[str] = []
+        self.columns: Dict[str, int] = {}
+        self._capacity = capacity
+        self.reset()
+
+    @property
+    def n_portfolios(self) -> int:
+        return len(self.configs)
+
+    def reset(self, portfolio_id: str = None):
+        """Resets one portfolio (by name) or all of them."""
+        with self._lock:
+            if portfolio_id is None:
+                n = self.n_portfolios
+                self.cash = self.initial.copy()
+                self.balance = self.initial.copy()
+                self.score = np.zeros(n, dtype=np.int64)
+                self.level = np.zeros(n, dtype=np.int64)
+                self.alive = np.ones(n, dtype=bool)
+                self.qty = np.zeros((n, self._capacity), dtype=np.int64)
+                self.avg_price = np.zeros((n, self._capacity), dtype=np.float64)
+                self.history = [deque(maxlen=self.history_limit) for _ in range(n)]
+                self.trades = np.zeros(n, dtype=np.int64)
+                return
+            p = self.ids[portfolio_id]
+            self.cash[p] = self.balance[p] = self.initial[p]
+            self.score[p] = self.level[p] = 0
+            self.alive[p] = True
+            self.qty[p] = 0
+            self.avg_price[p] = 0.0
+            self.history[p].clear()
+            self.trades[p] = 0
+
+    def _columns_for(self, tickers: List[str]) -> np.ndarray:
+        """Universe columns for tickers, adding new ones (arrays grow by doubling)."""
+        for t in tickers:
+            if t not in self.columns:
+                self.columns[t] = len(self.tickers)
+                self.tickers.append(t)
+        if len(self.tickers) > self._capacity:
+            while self._capacity < len(self.tickers):
+                self._capacity *= 2
+            grow = self._capacity - self.qty.shape[1]
+            self.qty = np.pad(self.qty, ((0, 0), (0, grow)))
+            self.avg_price = np.pad(self.avg_price, ((0, 0), (0, grow)))
+        return np.array([self.columns[t] for t in tickers], dtype=np.int64)
+
+    def _log(self, p: int, record: TradeRecord):
+        self.history[p].appendleft(record)
+        self.trades[p] += 1
+
+    def process_tick(self, market_data: list) -> Dict[str, List[TradeRecord]]:
+        """
+        Applies one market tick (HybridBrain decisions) to every portfolio.
+        Returns {portfolio name: [TradeRecords from this tick]} for portfolios that traded.
+        """
+        with self._lock:
+            return self._process_tick(market_data)
+
+    def _process_tick(self, market_data: list) -> Dict[str, List[TradeRecord]]:
+        now = time.time()
+        self.ticks += 1
+        events = [[] for _ in range(self.n_portfolios)]
+
+        # 1. Market columns, one per decision (duplicates included: entries are taken in decision
+        # order like SimulationEngine); exits and marks use each ticker's last quote of the tick
+        tickers = [item['Ticker'] for item in market_data]
+        cols = self._columns_for(tickers)
+        price = np.array([item.get('Price') or 0 for item in market_data], dtype=np.float64)
+        has_quote = price > 0 # Missing / non-positive Price = no quote: no TP/SL, valued at cost
+        conf = np.array([item['Confidence'] for item in market_data], dtype=np.float64)
+        has_volume = np.array(["Volume" in item.get('Reason', '') for item in market_data], dtype=bool)
+        is_buy = np.array([("BUY" in item.get('Signal', '') or "LONG" in item.get('Action', '') or
+                            "SNIPER" in item.get('Signal', '')) for item in market_data], dtype=bool)
+        quote_cols, quote_price = cols[has_quote], price[has_quote]
+        last_quote = np.zeros(len(self.tickers))
+        last_quote[quote_cols] = quote_price # Repeated columns: the last quote wins
+        quoted = np.unique(quote_cols)
+
+        # 2. Exits: TP / SL on held, quoted positions, all portfolios at once
+        qty = self.qty[:, quoted] # (P x Q) copies
+        entry = self.avg_price[:, quoted]
+        exit_price = last_quote[quoted]
+        held = qty > 0
+        with np.errstate(divide='ignore', invalid='ignore'):
+            pnl_pct = np.where(held, (exit_price[None, :] - entry) / entry * 100, 0.0)
+        tp = held & (pnl_pct >= self.take_profit[:, None])
+        sl = held & ~tp & (pnl_pct <= self.stop_loss[:, None])
+        sold = tp | sl
+        if sold.any():
+            self.cash += (qty * exit_price[None, :] * sold).sum(axis=1)
+            self.score += tp.sum(axis=1) * self.tp_reward + sl.sum(axis=1) * self.sl_reward
+            sellers = sold.any(axis=1)
+            self.level[sellers] = self._level_for(self.score[sellers])
+            # Records: pull the event values out as Python lists once, not per element
+            rows, ms = np.nonzero(sold)
+            levels = self.level[rows].tolist()
+            for p, m, is_tp, q, pnl, avg, level in zip(rows.tolist(), ms.tolist(), tp[rows, ms].tolist(),
+                                                      qty[rows, ms].tolist(), pnl_pct[rows, ms].tolist(),
+                                                      entry[rows, ms].tolist(), levels):
+                reward = int(self.tp_reward[p] if is_tp else self.sl_reward[p])
+                events[p].append(TradeRecord(now, 'SELL_TP' if is_tp else 'SELL_SL', self.tickers[quoted[m]], q,
+                                             float(exit_price[m]), level=LEVELS[level], reward=reward,
+                                             pnl_pct=pnl, entry_price=avg))
+            qty[sold] = 0
+            self.qty[:, quoted] = qty
+
+        # 3. Entries: level threshold per portfolio, cash permitting, in decision order
+        threshold = self.thresholds[np.arange(self.n_portfolios), self.level] # (P,)
+        adjusted = conf[None, :] + has_volume[None, :] * self.volume_boost[:, None] # (P x M)
+        allocation = self.balance * self.allocation # Balance as of the previous tick
+        with np.errstate(divide='ignore', invalid='ignore'):
+            buy_qty = np.where(has_quote, np.floor(allocation[:, None] / price[None, :]), 0).astype(np.int64)
+        candidate = (adjusted >= threshold[:, None]) & is_buy[None, :] & (self.qty[:, cols] == 0) & (buy_qty > 0)
+        if len(np.unique(cols)) < len(cols):
+            candidate = self._first_per_ticker(candidate, cols)
+        cost = np.where(candidate, buy_qty * price[None, :], 0.0)
+        # Cash only goes down, so a portfolio buys a prefix of its candidates:
+        # each one while the cash left before it still exceeds the allocation
+        spent_before = np.cumsum(cost, axis=1) - cost
+        bought = candidate & (self.cash[:, None] - spent_before > allocation[:, None])
+        if bought.any():
+            self.cash -= (cost * bought).sum(axis=1)
+            rows, ms = np.nonzero(bought)
+            self.qty[rows, cols[ms]] = buy_qty[rows, ms]
+            self.avg_price[rows, cols[ms]] = price[ms]
+            for p, m, q, c, level in zip(rows.tolist(), ms.tolist(), buy_qty[rows, ms].tolist(),
+                                         adjusted[rows, ms].tolist(), self.level[rows].tolist()):
+                events[p].append(TradeRecord(now, 'BUY', tickers[m], q, float(price[m]), confidence=c, level=LEVELS[level]))
+
+        # 4. Mark to market at the last quote (tickers missing or unquoted this tick are valued at cost)
+        mark = self.avg_price.copy()
+        mark[:, quote_cols] = quote_price[None, :]
+        self.balance = self.cash + (self.qty * mark).sum(axis=1)
+
+        # 5. Survival: Novice accounts die, others get a margin call (refill + demotion)
+        blown = self.balance <= 0
+        if blown.any():
+            dead = blown & (self.level == NOVICE)
+            margin = blown & ~dead
+            for p in np.nonzero(blown)[0]:
+                events[p].append(TradeRecord(now, 'BLOWN' if dead[p] else 'MARGIN_CALL', level=LEVELS[self.level[p]]))
+            self.alive[dead] = False
+            self.score[dead] = 0
+            self.balance[margin] = self.cash[margin] = self.initial[margin]
+            self.level[margin] = DEMOTE[self.level[margin]]
+            self.score[margin] = np.maximum(0, self.score[margin] - 50)
+
+        out = {}
+        for p, records in enumerate(events):
+            for record in records:
+                self._log(p, record)
+            if records:
+                out[self.configs[p].name] = records
+        return out
+
+    @staticmethod
+    def _first_per_ticker(candidate: np.ndarray, cols: np.ndarray) -> np.ndarray:
+        """Only the first candidate decision per (portfolio, ticker): a ticker is bought at most once a tick."""
+        order = np.argsort(cols, kind='stable')
+        ordered = candidate[:, order]
+        seen = np.cumsum(ordered, axis=1) # Candidates so far, counted within each ticker's run below
+        sorted_cols = cols[order]
+        start = np.flatnonzero(np.r_[True, sorted_cols[1:] != sorted_cols[:-1]])
+        run_start = np.repeat(start, np.diff(np.r_[start, len(cols)]))
+        before = np.where(run_start > 0, seen[:, run_start - 1], 0)
+        first = np.empty_like(candidate)
+        first[:, order] = ordered & (seen - before == 1)
+        return first
+
+    @staticmethod
+    def _level_for(score: np.ndarray) -> np.ndarray:
+        return np.maximum(np.searchsorted(LEVEL_SCORES, score, side='right') - 1, 0)
+
+    # --- Readers ---
+    def get_portfolio(self, portfolio_id: str) -> dict:
+        """
+        One portfolio in SimulationEngine.get_portfolio()'s shape (history as TradeRecords, newest first),
+        plus its config. KeyError for an unknown name.
+        """
+        p = self.ids[portfolio_id]
+        with self._lock:
+            held = np.nonzero(self.qty[p])[0]
+            return {
+                "name": portfolio_id,
+                "balance": float(self.balance[p]),
+                "cash": float(self.cash[p]),
+                "positions": {self.tickers[j]: {"qty": int(self.qty[p, j]), "avg_price": float(self.avg_price[p, j])}
+                              for j in held},
+                "score": int(self.score[p]),
+                "level": LEVELS[self.level[p]],
+                "status": "ALIVE" if self.alive[p] else "DEAD",
+                "history": tuple(self.history[p]),
+                "trades": int(self.trades[p]),
+                "version": self.ticks,
+                "config": asdict(self.configs[p])
+            }
+
+    def leaderboard(self) -> List[dict]:
+        """Every portfolio's headline numbers, best balance first."""
+        with self._lock:
+            order = np.argsort(-self.balance, kind='stable')
+            open_positions = (self.qty > 0).sum(axis=1)
+            return [{
+                "name": self.configs[p].name,
+                "balance": float(self.balance[p]),
+                "return_pct": float((self.balance[p] / self.initial[p] - 1) * 100),
+                "score": int(self.score[p]),
+                "level": LEVELS[self.level[p]],
+                "status": "ALIVE" if self.alive[p] else "DEAD",
+                "open_positions": int(open_positions[p]),
+                "trades": int(self.trades[p])
+            } for p in order]
@@ -0,0 +1,114 @@
+import numpy as np
+import pandas as pd
+from multiprocessing.shared_memory import SharedMemory
+from typing import List, Optional, Tuple
+
+class MarketPanel:
+    """
+    Columnar in-memory store for a whole ticker universe.
+
+    - values: one contiguous float64 array shaped (field x time x ticker), forward-filled.
+    - valid:  bool mask (time x ticker), True where the ticker actually had data (before ffill).
+    - Ticker -> column lookups are O(1) (dict), and per-ticker frames are zero-copy views
+      starting at the ticker's first valid bar.
+
+    Replaces `t in full_df.columns.get_level_values(0)` + `full_df[t].copy()` in the scanners.
+    """
+    FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+    def __init__(self, values: np.ndarray, index: pd.Index, tickers: List[str], fields: List[str] = None, valid: np.ndarray = None):
+        self.fields = list(fields or self.FIELDS)
+        self.values = values
+        self.index = index
+        self.tickers = list(tickers)
+        self.columns = {t: j for j, t in enumerate(self.tickers)}
+        self.field_pos = {f: i for i, f in enumerate(self.fields)}
+        self.valid = valid if valid is not None else ~np.isnan(values[self.field_pos.get('Close', 0)])
+
+        # First valid bar per ticker (len(index) if the ticker never traded)
+        # (argmax has no answer on an empty time axis, e.g. when every download failed)
+        has_data = self.valid.any(axis=0)
+        first = self.valid.argmax(axis=0) if len(index) else np.zeros(len(self.tickers), dtype=np.int64)
+        self.first_valid = np.where(has_data, first, len(index))
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, tickers: List[str] = None, fields: List[str] = None, ffill: bool = True) -> 'MarketPanel':
+        """
+        Builds a panel from a yfinance batch download (columns: Ticker x Price, group_by='ticker').
+        A flat (single ticker) frame needs `tickers` with exactly one entry.
+        """
+        fields = list(fields or cls.FIELDS)
+        if isinstance(df.columns, pd.MultiIndex):
+            available = set(df.columns.get_level_values(0))
+            tickers = tickers if tickers is not None else df.columns.get_level_values(0)
+            tickers = [t for t in dict.fromkeys(tickers) if t in available]
+            wide = df.reindex(columns=pd.MultiIndex.from_product([tickers, fields]))
+        elif tickers is not None and len(tickers) == 1:
+            wide = df.reindex(columns=fields)
+        else:
+            tickers = []
+            wide = pd.DataFrame(index=df.index)
+
+        # (time, ticker * field) -> (field, time, ticker), one contiguous copy
+        values = wide.to_numpy(dtype=np.float64).reshape(len(df), len(tickers), len(fields))
+        values = np.ascontiguousarray(values.transpose(2, 0, 1))
+        valid = ~np.isnan(values[fields.index('Close')]) if 'Close' in fields else ~np.isnan(values).all(axis=0)
+        if ffill:
+            values = cls._ffill(values)
+        return cls(values, df.index, tickers, fields, valid)
+
+    @staticmethod
+    def _ffill(values: np.ndarray) -> np.ndarray:
+        """Forward-fills NaNs along the time axis of a (field x time x ticker) array."""
+        missing = np.isnan(values)
+        if not missing.any():
+            return values
+        pos = np.where(missing, 0, np.arange(values.shape[1])[None, :, None])
+        np.maximum.accumulate(pos, axis=1, out=pos)
+        return np.take_along_axis(values, pos, axis=1)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def __contains__(self, ticker):
+        return ticker in self.columns
+
+    @property
+    def empty(self) -> bool:
+        return len(self.tickers) == 0 or len(self.index) == 0
+
+    def field(self, name: str) -> np.ndarray:
+        """(time x ticker) view of one field."""
+        return self.values[self.field_pos[name]]
+
+    def ticker_values(self, ticker: str) -> np.ndarray:
+        """(field x time) view for one ticker, from its first valid bar."""
+        j = self.columns[ticker]
+        return self.values[:, self.first_valid[j]:, j]
+
+    def ticker_frame(self, ticker: str) -> pd.DataFrame:
+        """Zero-copy DataFrame (time x field) for one ticker, from its first valid bar."""
+        j = self.columns[ticker]
+        start = self.first_valid[j]
+        return pd.DataFrame(self.values[:, start:, j].T, index=self.index[start:], columns=self.fields, copy=False)
+
+    def to_shared(self) -> Tuple[SharedMemory, dict]:
+        """
+        Copies the values into a new SharedMemory block.
+        Returns the block (caller must close() and unlink() it) and a small picklable spec
+        for `from_shared` in other processes.
+        """
+        shm = SharedMemory(create=True, size=max(self.values.nbytes, 1))
+        np.ndarray(self.values.shape, dtype=np.float64, buffer=shm.buf)[:] = self.values
+        spec = {
+            'name': shm.name, 'shape': self.values.shape, 'index': self.index,
+            'tickers': self.tickers, 'fields': self.fields, 'valid': self.valid
+        }
+        return shm, spec
+
+    @classmethod
+    def from_shared(cls, spec: dict) -> Tuple['MarketPanel', SharedMemory]:
+        """Attaches to a panel published with `to_shared`. Keep the returned block alive while using the panel."""
+        shm = SharedMemory(name=spec['name'])
+        values = np.ndarray(spec['shape'], dtype=np.float64, buffer=shm.buf)
+        return cls(values, spec['index'], spec['tickers'], spec['fields'], spec['valid']), shm
@@ -0,0 +1,99 @@
+import numpy as np
+from typing import Dict, List
+
+class PositionBook:
+    """
+    Open positions of one portfolio, indexed for vectorized tick processing.
+
+    - slots: ticker -> slot (dict, O(1)); closed slots are reused.
+    - qty / avg_price / last_price / opened: NumPy arrays by slot (qty 0 = free slot).
+      `opened` is an open counter, so positions can be walked in the order they were opened.
+    - positions: the same book as {ticker: {qty, avg_price}} (what is journaled and published),
+      updated in O(1) on every open/close.
+    """
+    def __init__(self, capacity: int = 64):
+        self.slots: Dict[str, int] = {}
+        self.tickers: List[str] = [''] * capacity
+        self.qty = np.zeros(capacity, dtype=np.int64)
+        self.avg_price = np.zeros(capacity, dtype=np.float64)
+        self.last_price = np.zeros(capacity, dtype=np.float64) # Price used for the latest valuation
+        self.opened = np.zeros(capacity, dtype=np.int64)
+        self.positions: Dict[str, dict] = {}
+        self._free = list(range(capacity - 1, -1, -1))
+        self._opens = 0
+
+    @classmethod
+    def from_positions(cls, positions: dict) -> 'PositionBook':
+        book = cls(max(64, 2 * len(positions)))
+        for ticker, position in positions.items():
+            book.open(ticker, position['qty'], position['avg_price'])
+        return book
+
+    def __len__(self):
+        return len(self.slots)
+
+    def __contains__(self, ticker):
+        return ticker in self.slots
+
+    def _grow(self):
+        old = len(self.qty)
+        self.tickers.extend([''] * old)
+        self.qty = np.concatenate([self.qty, np.zeros(old, dtype=np.int64)])
+        self.avg_price = np.concatenate([self.avg_price, np.zeros(old)])
+        self.last_price = np.concatenate([self.last_price, np.zeros(old)])
+        self.opened = np.concatenate([self.opened, np.zeros(old, dtype=np.int64)])
+        self._free.extend(range(2 * old - 1, old - 1, -1))
+
+    def open(self, ticker: str, qty: int, price: float):
+        """Opens (or replaces) the position in `ticker`."""
+        if ticker in self.slots:
+            self.close(ticker)
+        if not self._free:
+            self._grow()
+        slot = self._free.pop()
+        self.slots[ticker] = slot
+        self.tickers[slot] = ticker
+        self.qty[slot] = qty
+        self.avg_price[slot] = self.last_price[slot] = price
+        self.opened[slot] = self._opens
+        self._opens += 1
+        self.positions[ticker] = {"qty": qty, "avg_price": price}
+
+    def close(self, ticker: str) -> dict:
+        """Removes the position; returns its {qty, avg_price}."""
+        slot = self.slots.pop(ticker)
+        self.tickers[slot] = ''
+        self.qty[slot] = 0
+        self._free.append(slot)
+        return self.positions.pop(ticker)
+
+    def clear(self):
+        for ticker in list(self.slots):
+            self.close(ticker)
+
+    def lookup(self, tickers: List[str]) -> np.ndarray:
+        """Slot per ticker (-1 where no position is held)."""
+        get = self.slots.get
+        return np.array([get(t, -1) for t in tickers], dtype=np.int64)
+
+    def mark(self, slots: np.ndarray, prices: np.ndarray) -> np.ndarray:
+        """
+        Sets last_price for the held slots among `slots` (-1 entries ignored; for repeated slots
+        the last price wins) and resets every other position to its cost.
+        Returns the quoted slots (sorted, unique).
+        """
+        held = slots >= 0
+        self.last_price[:] = self.avg_price
+        self.last_price[slots[held]] = prices[held]
+        quoted = np.zeros(len(self.qty), dtype=bool)
+        quoted[slots[held]] = True
+        return np.flatnonzero(quoted)
+
+    def market_value(self) -> float:
+        """Sum of qty x last_price over open positions (free slots have qty 0)."""
+        return float(self.qty @ self.last_price)
+
+    def pnl_pct(self, slots: np.ndarray) -> np.ndarray:
+        """Unrealized % P&L at last_price for open slots."""
+        entry = self.avg_price[slots]
+        return (self.last_price[slots] - entry) / entry * 100
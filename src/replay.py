@@ -0,0 +1,105 @@
+import json
+import logging
+import time
+from typing import Iterable, Iterator, Tuple
+import numpy as np
+from .simulation_engine import SimulationEngine
+from .multi_portfolio import MultiPortfolioEngine
+
+logger = logging.getLogger('Replay')
+
+DECISIONS_PATH = "decision_log.jsonl" # One line per simulation tick: {"bar", "decisions"}
+DECISION_FIELDS = ('Ticker', 'Action', 'Signal', 'Reason', 'Confidence', 'Price') # What process_tick reads
+
+def slim(decisions: list) -> list:
+    """Decisions reduced to the fields the simulation uses (no History / Rational)."""
+    return [{k: d[k] for k in DECISION_FIELDS if k in d} for d in decisions]
+
+class DecisionRecorder:
+    """
+    Appends every decision snapshot the simulation ticks on to a JSONL file,
+    so live sessions can be replayed later (see load_decisions / replay).
+    """
+    def __init__(self, path: str = DECISIONS_PATH):
+        self.path = path
+
+    def record(self, bar, decisions: list):
+        line = json.dumps({"bar": str(bar), "decisions": slim(decisions)}, separators=(',', ':'),
+                          default=lambda o: o.item() if hasattr(o, 'item') else str(o))
+        try:
+            with open(self.path, 'a') as f:
+                f.write(line + "\n")
+        except OSError as e:
+            logger.error(f"Could not record decisions: {e}")
+
+def load_decisions(path: str = DECISIONS_PATH) -> Iterator[Tuple[str, list]]:
+    """Yields (bar, decisions) from a recorded log. Unreadable (e.g. torn) lines are skipped."""
+    with open(path, 'r') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                logger.warning("Skipping unreadable decision log line.")
+                continue
+            yield entry['bar'], entry['decisions']
+
+def _balances(engine) -> np.ndarray:
+    if isinstance(engine, MultiPortfolioEngine):
+        return engine.balance.copy()
+    return np.array([engine.state['balance']])
+
+def equity_metrics(equity: np.ndarray, initial: np.ndarray) -> dict:
+    """Total return and max drawdown (%) per column of a (tick x portfolio) balance curve."""
+    if len(equity) == 0:
+        zeros = np.zeros(equity.shape[1])
+        return {'return_pct': zeros, 'max_drawdown_pct': zeros}
+    peak = np.maximum.accumulate(np.vstack([initial[None, :], equity]), axis=0)[1:]
+    drawdown = (equity - peak) / peak * 100
+    return {'return_pct': (equity[-1] / initial - 1) * 100, 'max_drawdown_pct': drawdown.min(axis=0)}
+
+def replay(ticks: Iterable[Tuple[str, list]], engine=None) -> dict:
+    """
+    Feeds (bar, decisions) ticks through a simulation engine as fast as possible.
+
+    engine: a SimulationEngine (default: a fresh in-memory one, persist=False) or a
+    MultiPortfolioEngine. Only the process_tick loop is timed; ticks are materialized first.
+    Returns ticks, seconds, ticks_per_sec, first/last bar, the balance curve and final metrics.
+    """
+    engine = engine if engine is not None else SimulationEngine(persist=False)
+    ticks = ticks if isinstance(ticks, list) else list(ticks)
+    multi = isinstance(engine, MultiPortfolioEngine)
+    initial = _balances(engine)
+    equity = np.empty((len(ticks), len(initial)))
+
+    start = time.perf_counter()
+    for i, (_, decisions) in enumerate(ticks):
+        engine.process_tick(decisions)
+        equity[i] = engine.balance if multi else engine.state['balance']
+    seconds = time.perf_counter() - start
+
+    curve = equity_metrics(equity, initial)
+    report = {
+        'ticks': len(ticks),
+        'seconds': seconds,
+        'ticks_per_sec': len(ticks) / seconds if seconds > 0 else float('inf'),
+        'first_bar': ticks[0][0] if ticks else None,
+        'last_bar': ticks[-1][0] if ticks else None,
+        'equity': equity
+    }
+    if multi:
+        board = engine.leaderboard()
+        for row in board:
+            p = engine.ids[row['name']]
+            row['max_drawdown_pct'] = float(curve['max_drawdown_pct'][p])
+        report['portfolios'] = board
+    else:
+        portfolio = engine.get_portfolio()
+        stats = engine.analytics()
+        report['portfolio'] = {k: portfolio[k] for k in ('balance', 'cash', 'score', 'level', 'status')}
+        report['portfolio']['open_positions'] = len(portfolio['positions'])
+        report['metrics'] = {
+            'return_pct': float(curve['return_pct'][0]),
+            'max_drawdown_pct': float(curve['max_drawdown_pct'][0]),
+            **{k: stats[k] for k in ('trades', 'buys', 'sells', 'hit_rate', 'total_reward', 'realized_pnl')}
+        }
+    return report
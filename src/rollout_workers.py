@@ -0,0 +1,164 @@
+import copy
+import logging
+import os
+import numpy as np
+import pandas as pd
+import torch
+import torch.multiprocessing as mp
+from torch.distributions import Categorical
+from typing import List, Optional
+from .env import VecTradingEnv
+
+logger = logging.getLogger('RolloutWorkers')
+
+def _worker_loop(worker_id, dfs, env_kwargs, shared_model, buffers, conn, seed):
+    """
+    Subprocess body. Owns a VecTradingEnv over its slice of the data and, on every
+    'collect' command, refreshes its local policy from the shared weights and writes
+    one rollout straight into the shared-memory buffers.
+    """
+    torch.set_num_threads(1) # One core per worker; the pool provides the parallelism
+    env = VecTradingEnv(dfs, **env_kwargs)
+    model = copy.deepcopy(shared_model) # Local (non-shared) copy of the policy
+    rollout_steps = buffers['rewards'].shape[0]
+
+    # Episodes continue across rollouts (VecTradingEnv autoresets)
+    state, _ = env.reset(seed=seed)
+    conn.send(('ready', worker_id))
+
+    while True:
+        cmd = conn.recv()
+        if cmd == 'close':
+            break
+
+        # 'collect': sync weights, then run one rollout
+        model.load_state_dict(shared_model.state_dict())
+        with torch.no_grad():
+            for t in range(rollout_steps):
+                state_tensor = torch.as_tensor(state, dtype=torch.float32)
+                probs, value = model(state_tensor)
+                m = Categorical(probs)
+                action = m.sample()
+
+                next_state, reward, terminated, truncated, _ = env.step(action.numpy())
+
+                buffers['states'][t] = state_tensor
+                buffers['actions'][t] = action
+                buffers['log_probs'][t] = m.log_prob(action)
+                buffers['rewards'][t] = torch.from_numpy(reward)
+                buffers['values'][t] = value.squeeze(-1)
+                buffers['dones'][t] = torch.from_numpy(np.logical_or(terminated, truncated))
+                state = next_state
+            buffers['last_states'][:] = torch.as_tensor(state, dtype=torch.float32)
+        conn.send(('done', worker_id))
+
+    conn.close()
+
+class RolloutWorkerPool:
+    """
+    Pool of subprocesses collecting PPO experience for TradingAgent.
+
+    Each worker owns a VecTradingEnv over a slice of the DataFrames and steps it with a
+    copy of the ActorCritic weights, synced from a shared-memory model before every rollout.
+    Trajectories are written into preallocated shared-memory tensors, so nothing but a
+    short command/ack goes through the pipes.
+
+    Usage: sync_weights(model) -> request() -> ... (learner updates) ... -> collect()
+    TradingAgent drives this loop itself when given `rollout_pool`.
+    """
+    def __init__(self, dfs: List[pd.DataFrame], model: torch.nn.Module, num_workers: Optional[int] = None,
+                 rollout_steps: int = 200, env_kwargs: dict = None, seed: int = 0):
+        env_kwargs = env_kwargs or {}
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        num_workers = max(1, min(num_workers, len(dfs)))
+        self.num_envs = len(dfs)
+        self.rollout_steps = rollout_steps
+
+        # Shared weights the learner writes into and the workers read from
+        self.shared_model = copy.deepcopy(model).cpu()
+        self.shared_model.share_memory()
+
+        obs_dim = self.shared_model.fc1.in_features
+        ctx = mp.get_context('spawn')
+
+        self.workers, self.conns, self.buffers = [], [], []
+        self.pending = False
+        for worker_id, idx in enumerate(np.array_split(np.arange(len(dfs)), num_workers)):
+            n_envs = len(idx)
+            buffers = {
+                'states': torch.zeros(rollout_steps, n_envs, obs_dim),
+                'actions': torch.zeros(rollout_steps, n_envs, dtype=torch.long),
+                'log_probs': torch.zeros(rollout_steps, n_envs),
+                'rewards': torch.zeros(rollout_steps, n_envs),
+                'values': torch.zeros(rollout_steps, n_envs),
+                'dones': torch.zeros(rollout_steps, n_envs),
+                'last_states': torch.zeros(n_envs, obs_dim),
+            }
+            for buf in buffers.values():
+                buf.share_memory_()
+
+            parent_conn, child_conn = ctx.Pipe()
+            proc = ctx.Process(
+                target=_worker_loop,
+                args=(worker_id, [dfs[i] for i in idx], env_kwargs, self.shared_model, buffers, child_conn, seed + worker_id),
+                daemon=True
+            )
+            proc.start()
+            child_conn.close()
+
+            self.workers.append(proc)
+            self.conns.append(parent_conn)
+            self.buffers.append(buffers)
+
+        # Wait until every worker has built its environments (TDA precompute can be slow)
+        for conn in self.conns:
+            conn.recv()
+        logger.info(f"Started {num_workers} rollout workers for {len(dfs)} environments.")
+
+    def sync_weights(self, model: torch.nn.Module):
+        """Copies the learner's weights into shared memory (in place)."""
+        if self.pending:
+            raise RuntimeError("Cannot sync weights while a collection is in flight.")
+        # load_state_dict copies into the existing (shared) storage
+        self.shared_model.load_state_dict(model.state_dict())
+
+    def request(self):
+        """Starts one rollout on every worker without waiting for it."""
+        if self.pending:
+            raise RuntimeError("A collection is already in flight.")
+        for conn in self.conns:
+            conn.send('collect')
+        self.pending = True
+
+    def collect(self) -> dict:
+        """
+        Waits for the requested rollouts and returns them as (steps, total_envs, ...) tensors.
+        The result is a copy, so workers can immediately start overwriting their buffers.
+        """
+        if not self.pending:
+            raise RuntimeError("No collection requested.")
+        for conn in self.conns:
+            conn.recv()
+        self.pending = False
+
+        rollout = {}
+        for key in self.buffers[0]:
+            dim = 0 if key == 'last_states' else 1
+            rollout[key] = torch.cat([buffers[key] for buffers in self.buffers], dim=dim)
+        return rollout
+
+    def close(self):
+        if self.pending:
+            self.collect()
+        for conn in self.conns:
+            conn.send('close')
+        for proc in self.workers:
+            proc.join()
+        self.workers, self.conns = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,212 @@
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Callable, Optional
+from .trade_records import render
+from .encoding import JSON, MSGPACK, pack, compress, decisions_rows, decisions_columnar
+from .metrics import METRICS, span, profiled
+
+logger = logging.getLogger('ScanService')
+
+class ScanSnapshot:
+    """
+    One published scan. Each representation (format x media type x content encoding)
+    is encoded once, on first request, and served as-is to every later poll.
+    """
+    __slots__ = ('version', 'payload', 'etag', 'bar', 'created', '_variants')
+
+    def __init__(self, version: int, payload: dict, bar, created: str):
+        self.version = version
+        self.payload = payload # decisions with columnar History
+        self.bar = bar
+        self.created = created
+        # Default representation (row-oriented JSON, uncompressed) is encoded up front
+        body = pack(dict(payload, data=decisions_rows(payload['data'])))
+        self.etag = '"' + hashlib.blake2b(body, digest_size=8).hexdigest() + '"'
+        self._variants = {('rows', JSON, None): (body, self.etag)}
+
+    @property
+    def body(self) -> bytes:
+        return self._variants[('rows', JSON, None)][0]
+
+    def encode(self, fmt: str = 'rows', media_type: str = JSON, encoding: str = None):
+        """Returns (bytes, etag) for a representation; cached per snapshot."""
+        key = (fmt, media_type, encoding)
+        METRICS.cache('snapshot_encoding', key in self._variants)
+        if key not in self._variants:
+            data = decisions_columnar(self.payload['data']) if fmt == 'columnar' else decisions_rows(self.payload['data'])
+            raw = pack(dict(self.payload, data=data), media_type)
+            variant = f"{fmt}-{'mp' if media_type == MSGPACK else 'js'}-{encoding or 'id'}"
+            self._variants[key] = (compress(raw, encoding), self.etag[:-1] + '-' + variant + '"')
+        return self._variants[key]
+
+class ScanJob:
+    """A requested scan (queued -> running -> done | failed), optionally profiled."""
+    __slots__ = ('id', 'status', 'created', 'started', 'finished', 'error', 'version', 'future', 'profile', 'profile_path')
+
+    def __init__(self, profile: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.status = 'queued'
+        self.created = datetime.now().isoformat(timespec='seconds')
+        self.started = self.finished = self.error = self.version = None
+        self.future = None
+        self.profile = profile
+        self.profile_path = None # Set once a profiled scan finishes
+
+    @property
+    def active(self) -> bool:
+        return self.status in ('queued', 'running')
+
+    def to_dict(self) -> dict:
+        return {
+            'id': self.id, 'status': self.status, 'created': self.created,
+            'started': self.started, 'finished': self.finished, 'error': self.error,
+            'snapshot_version': self.version, 'profile': self.profile_path
+        }
+
+class ScanService:
+    """
+    Runs HybridBrain scans off the request path and publishes immutable snapshots.
+
+    - The clock thread scans once per market bar (`bar_seconds`, aligned to the wall clock).
+    - The simulation ticks only when the scan saw a new bar (brain.last_bar changed),
+      so dashboard polling can't drive trading. The optional multi-portfolio engine
+      (`portfolios`) gets the same ticks, and a DecisionRecorder (`recorder`) logs them for replay.
+    - Readers just grab `self.snapshot` (a reference swap, no locking).
+    - Scans (clock or on demand via submit()) run as jobs on a bounded executor; a request
+      while a scan is queued/running joins that job instead of starting another one.
+    """
+    def __init__(self, brain, sim_engine, portfolio_view: Callable[[dict], dict] = None,
+                 bar_seconds: int = 15 * 60, bar_delay: int = 5, max_workers: int = 1, max_jobs: int = 100,
+                 portfolios=None, recorder=None):
+        self.brain = brain
+        self.sim_engine = sim_engine
+        self.portfolios = portfolios # MultiPortfolioEngine (optional)
+        self.recorder = recorder # DecisionRecorder (optional)
+        self.portfolio_view = portfolio_view or (lambda p: p)
+        self.bar_seconds = bar_seconds
+        self.bar_delay = bar_delay # Seconds after the boundary before the new bar is fetched
+
+        self.snapshot: Optional[ScanSnapshot] = None
+        self.decisions = []
+        self.logs = [] # TradeRecords from the last simulation tick
+        self.last_bar = None # Bar the simulation last ticked on
+        self._version = 0
+        self._scan_lock = threading.Lock() # One scan at a time
+        self._publish_lock = threading.Lock()
+        self._clock = None
+        self._stop = threading.Event()
+
+        # Jobs
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='scan')
+        self.jobs = OrderedDict() # id -> ScanJob (last max_jobs kept)
+        self.max_jobs = max_jobs
+        self._jobs_lock = threading.Lock()
+        self._active_job = None
+
+    def refresh(self) -> ScanSnapshot:
+        """Runs one scan, ticks the simulation if a new market bar printed, and publishes."""
+        with self._scan_lock, span('scan'):
+            decisions = self.brain.think()
+            bar = getattr(self.brain, 'last_bar', None)
+
+            logs = []
+            if bar is not None and bar != self.last_bar:
+                with span('process_tick'):
+                    logs = self.sim_engine.process_tick(decisions)
+                if self.portfolios is not None:
+                    with span('portfolios_tick'):
+                        self.portfolios.process_tick(decisions)
+                if self.recorder is not None:
+                    with span('record_decisions'):
+                        self.recorder.record(bar, decisions)
+                self.last_bar = bar
+
+            # Sort by Confidence for the UI
+            decisions.sort(key=lambda x: x['Confidence'], reverse=True)
+            self.decisions, self.logs = decisions, logs
+            return self.publish()
+
+    def publish(self) -> ScanSnapshot:
+        """Freezes the latest decisions + portfolio into a new snapshot (call after the portfolio changes)."""
+        with self._publish_lock, span('publish'):
+            payload = {
+                "status": "success",
+                "data": self.decisions,
+                "simulation": self.portfolio_view(self.sim_engine.get_portfolio()),
+                "logs": [render(r) for r in self.logs],
+                "bar": None if self.last_bar is None else str(self.last_bar)
+            }
+            self._version += 1
+            self.snapshot = ScanSnapshot(self._version, payload, self.last_bar, datetime.now().isoformat(timespec='seconds'))
+            return self.snapshot
+
+    # --- Jobs ---
+    def submit(self, profile: bool = False) -> ScanJob:
+        """
+        Queues a scan, or returns the one already queued/running (request coalescing).
+        profile=True profiles the new scan (see metrics.profiled); a joined scan isn't profiled.
+        """
+        with self._jobs_lock:
+            if self._active_job is not None and self._active_job.active:
+                return self._active_job
+            job = ScanJob(profile)
+            self.jobs[job.id] = job
+            while len(self.jobs) > self.max_jobs:
+                self.jobs.popitem(last=False)
+            self._active_job = job
+            job.future = self.executor.submit(self._run_job, job)
+            return job
+
+    def get_job(self, job_id: str) -> Optional[ScanJob]:
+        return self.jobs.get(job_id)
+
+    def _run_job(self, job: ScanJob):
+        job.status = 'running'
+        job.started = datetime.now().isoformat(timespec='seconds')
+        try:
+            if job.profile:
+                with profiled(f"scan-{job.id}") as result:
+                    job.version = self.refresh().version
+                job.profile_path = result['path']
+            else:
+                job.version = self.refresh().version
+            job.status = 'done'
+        except Exception as e:
+            logger.error(f"Scan job {job.id} failed: {e}")
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished = datetime.now().isoformat(timespec='seconds')
+        return job
+
+    def shutdown(self):
+        self.stop_clock()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    # --- Bar clock ---
+    def start_clock(self):
+        if self._clock is not None and self._clock.is_alive():
+            return
+        self._stop.clear()
+        self._clock = threading.Thread(target=self._run_clock, name='scan-clock', daemon=True)
+        self._clock.start()
+
+    def stop_clock(self):
+        self._stop.set()
+
+    def _run_clock(self):
+        while not self._stop.is_set():
+            try:
+                self.submit().future.result() # Joins a scan someone else already requested
+            except Exception as e: # Executor shut down
+                logger.warning(f"Clock stopped: {e}")
+                return
+            # Sleep until the next bar boundary
+            wait = self.bar_seconds - (time.time() % self.bar_seconds) + self.bar_delay
+            self._stop.wait(wait)
@@ -1,54 +1,342 @@
 import logging
 import json
 import os
+import threading
+from bisect import bisect_right
+from collections import deque
+import time
 from datetime import datetime
+import numpy as np
+from .trade_records import TradeRecord, trade_analytics
+from .position_book import PositionBook
+from .metrics import timed
 
 # Configure Logger
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger('SimEngine')
 
-DB_PATH = "simulation_state.json"
+DB_PATH = "simulation_state.json" # Compact snapshot
+JOURNAL_PATH = "simulation_journal.jsonl" # Append-only, one line per tick that changed something
+SNAPSHOT_EVERY = 500 # Journal entries between snapshots
+HISTORY_LIMIT = 100 # Recent log entries kept in memory (older ones are paged from the journal)
+
+SCALAR_FIELDS = ("balance", "cash", "score", "level", "status")
 
 class SimulationEngine:
     """
     Manages a Paper Trading Portfolio with RL-style scoring.
+    
+    Persistence: every tick appends one small JSON line (changed scalars, touched positions,
+    new log entries) to the journal. Every `snapshot_every` entries the full state is written
+    as a snapshot that remembers the journal offset; on restart the snapshot is loaded and
+    the journal is replayed from there. With persist=False nothing touches disk: the state
+    starts fresh and the log is kept in memory (replay.py runs months of ticks this way).
+    
+    History: state['history'] is a bounded deque of (event_id, TradeRecord), newest first.
+    Event ids are sequential; history_page() serves older ones from the journal.
+    Records are rendered to text only by the API (TradeRecord.render).
+    
+    Concurrency: single writer. Mutations (process_tick, check_survival, reset) run under
+    self._lock; after each commit a fresh read-only snapshot is published (copy-on-write),
+    so get_portfolio() / history_page() readers never lock or see a half-applied tick.
     """
     
-    def __init__(self, initial_balance=10000.0):
-        self.state = self.load_state() or {
+    def __init__(self, initial_balance=10000.0, db_path=DB_PATH, journal_path=JOURNAL_PATH, snapshot_every=SNAPSHOT_EVERY,
+                 history_limit=HISTORY_LIMIT, persist=True):
+        self.persist = persist # False: in-memory only (replays, experiments); nothing is read or written
+        self.db_path = db_path
+        self.journal_path = journal_path
+        self.snapshot_every = snapshot_every
+        self.history_limit = history_limit
+        self.seq = 0 # Last journal entry reflected in self.state
+        self.snapshot_seq = 0
+        self.journal_offset = 0 # Journal size (bytes) at self.snapshot_seq
+        self.events = 0 # Log entries ever written (next event id)
+        self._journal = None
+        self._index = None # ([first event id], [byte offset]) of journal lines with log entries (built lazily)
+        self._lock = threading.RLock() # Writer lock
+        self.version = 0 # Published snapshot version
+        self.generation = 0 # Bumped when reset() starts a new journal
+        self._view = None # (portfolio, recent [(event_id, record)] newest first, events, generation)
+        self._touched = set() # Positions changed since the last commit
+        self._logs = [] # Records since the last commit (oldest first)
+        self._records = [] # Full log when not persisting (stands in for the journal)
+        
+        self.state = (self.persist and self.load_state()) or self.initial_state(initial_balance)
+        self.state['history'] = deque(self.state['history'], maxlen=self.history_limit)
+        self.book = PositionBook.from_positions(self.state['positions'])
+        self.state['positions'] = self.book.positions # Same dict, maintained by the book
+        if self.persist:
+            self.replay_journal()
+        self._committed = {k: self.state.get(k) for k in SCALAR_FIELDS}
+        self._publish()
+        
+    @staticmethod
+    def initial_state(initial_balance=10000.0):
+        return {
             "balance": initial_balance,
             "cash": initial_balance,
             "positions": {}, # {ticker: {qty, avg_price}}
-            "history": [], # Trade logs
+            "history": [], # Recent trade records [(event_id, TradeRecord)], newest first
             "score": 0, # RL Score (+1 Profit, -4 Loss)
             "level": "Novice (Risk Taker)",
             "status": "ALIVE" # ALIVE or DEAD
         }
         
     def load_state(self):
-        if os.path.exists(DB_PATH):
+        if os.path.exists(self.db_path):
             try:
-                with open(DB_PATH, 'r') as f:
-                    return json.load(f)
+                with open(self.db_path, 'r') as f:
+                    state = json.load(f)
+                self.seq = self.snapshot_seq = state.pop('journal_seq', 0)
+                self.journal_offset = state.pop('journal_offset', 0)
+                if 'journal_events' in state:
+                    self.events = state.pop('journal_events')
+                    state['history'] = [(i, self.decode(row)) for i, row in state['history']]
+                else:
+                    # Pre-journal snapshot: plain list of strings, newest first
+                    self.events = len(state['history'])
+                    state['history'] = [(self.events - 1 - i, entry) for i, entry in enumerate(state['history'])]
+                return state
             except:
                 return None
         return None
         
+    def replay_journal(self):
+        """Applies journal entries written after the loaded snapshot. A torn last line is discarded."""
+        if not os.path.exists(self.journal_path):
+            self.journal_offset = 0
+            return
+        with open(self.journal_path, 'rb+') as f:
+            end = min(self.journal_offset, os.path.getsize(self.journal_path))
+            f.seek(end)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    break
+                self.apply_entry(entry)
+                end += len(line)
+            f.truncate(end)
+        
+    def apply_entry(self, entry: dict):
+        """Applies one journal entry to self.state."""
+        self.state.update(entry['set'])
+        for ticker, position in entry['positions'].items():
+            if position is None:
+                if ticker in self.book:
+                    self.book.close(ticker)
+            else:
+                self.book.open(ticker, position['qty'], position['avg_price'])
+        first_id = entry.get('log_id', self.events)
+        for i, row in enumerate(entry['log']):
+            self.state['history'].appendleft((first_id + i, self.decode(row)))
+        self.events = first_id + len(entry['log'])
+        self.seq = entry['seq']
+        
+    @timed('save_state')
     def save_state(self):
-        with open(DB_PATH, 'w') as f:
-            json.dump(self.state, f, indent=4)
+        """
+        Writes a compact snapshot of the full state (and the journal position it covers).
+        Atomic: written to a temp file, fsynced, then renamed over the old snapshot.
+        """
+        if not self.persist:
+            return
+        with self._lock:
+            self._flush_journal()
+            snapshot = dict(self.state, history=[(i, self.encode(r)) for i, r in self.state['history']],
+                            journal_seq=self.seq, journal_offset=self.journal_offset, journal_events=self.events)
+            tmp_path = self.db_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(snapshot, f, separators=(',', ':'))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.db_path)
+            self.snapshot_seq = self.seq
+            
+    def _publish(self):
+        """Freezes the current state into a new read-only snapshot for readers."""
+        recent = tuple(self.state['history'])
+        published = dict(
+            self.state,
+            positions={t: dict(p) for t, p in self.state['positions'].items()},
+            history=tuple(record for _, record in recent),
+            version=self.version + 1
+        )
+        # One tuple -> readers get a consistent view with a single attribute read
+        self._view = (published, recent, self.events, self.generation)
+        self.version += 1
+        
+    def commit(self):
+        """
+        Appends the changes since the last commit to the journal as one line.
+        O(changes) on disk; a full snapshot only every `snapshot_every` entries.
+        """
+        changed = {k: self.state.get(k) for k in SCALAR_FIELDS if self.state.get(k) != self._committed[k]}
+        if not (changed or self._touched or self._logs):
+            return
+        if not self.persist:
+            self._records.extend(self._logs) # In-memory journal
+        else:
+            entry = {
+                "seq": self.seq + 1,
+                "time": datetime.now().isoformat(timespec='seconds'),
+                "set": changed,
+                "positions": {t: self.state['positions'].get(t) for t in self._touched},
+                "log_id": self.events - len(self._logs),
+                "log": [self.encode(r) for r in self._logs]
+            }
+            if self._journal is None:
+                self._journal = open(self.journal_path, 'ab')
+            offset = self._journal.tell()
+            self._journal.write((json.dumps(entry, separators=(',', ':')) + "\n").encode())
+            self._journal.flush()
+            if self._index is not None and self._logs:
+                self._index[0].append(entry['log_id'])
+                self._index[1].append(offset)
+        
+        self.seq += 1
+        self._committed.update(changed)
+        self._touched = set()
+        self._logs = []
+        if self.seq - self.snapshot_seq >= self.snapshot_every:
+            self.save_state()
+        self._publish()
+            
+    def _flush_journal(self):
+        if self._journal is not None:
+            self._journal.flush()
+            self.journal_offset = self._journal.tell()
+        elif os.path.exists(self.journal_path):
+            self.journal_offset = os.path.getsize(self.journal_path)
+        else:
+            self.journal_offset = 0
+            
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+            
+    @staticmethod
+    def encode(record):
+        """Journal/snapshot form of a history entry (compact row; legacy strings stay strings)."""
+        return record.to_row() if isinstance(record, TradeRecord) else record
+        
+    @staticmethod
+    def decode(row):
+        return TradeRecord.from_row(row) if isinstance(row, list) else row
+        
+    def log(self, record: TradeRecord):
+        self.state['history'].appendleft((self.events, record))
+        self.events += 1
+        self._logs.append(record)
+        
+    def history_page(self, cursor: int = None, limit: int = 50) -> dict:
+        """
+        Log entries with event id < cursor (default: all), newest first.
+        Served from memory while inside the recent window, otherwise from the journal.
+        Returns {'items': [{'id', 'record'}], 'next_cursor': id to pass next (None at the end)}.
+        """
+        _, recent, events, generation = self._view
+        end = events if cursor is None else max(0, min(cursor, events))
+        start = max(0, end - limit)
+        if recent and start >= recent[-1][0]:
+            items = [(i, entry) for i, entry in recent if start <= i < end]
+        else:
+            items = self._journal_events(start, end, generation)
+        return {
+            'items': [{'id': i, 'record': record} for i, record in items],
+            'next_cursor': start if start > 0 else None
+        }
+        
+    def _journal_events(self, start: int, end: int, generation: int) -> list:
+        """
+        [(event_id, record)] for start <= id < end, newest first, read from the journal.
+        Holds the writer lock (older pages are rare; reset() could otherwise truncate mid-read).
+        """
+        with self._lock:
+            if generation != self.generation:
+                return [] # Page from before a reset
+            if not self.persist:
+                return [(i, self._records[i]) for i in range(end - 1, start - 1, -1)]
+            if not os.path.exists(self.journal_path):
+                return []
+            if self._index is None:
+                # One pass over the journal; kept up to date by commit() afterwards
+                self._index = ([], [])
+                with open(self.journal_path, 'rb') as f:
+                    offset = 0
+                    for line in f:
+                        if not line.endswith(b"\n"): break
+                        entry = json.loads(line)
+                        if entry['log'] and 'log_id' in entry:
+                            self._index[0].append(entry['log_id'])
+                            self._index[1].append(offset)
+                        offset += len(line)
+            return self._read_index(start, end)
+        
+    def _read_index(self, start: int, end: int) -> list:
+        first_ids, offsets = self._index
+        pos = bisect_right(first_ids, end - 1) - 1
+        items = []
+        with open(self.journal_path, 'rb') as f:
+            while pos >= 0:
+                first_id = first_ids[pos]
+                f.seek(offsets[pos])
+                logs = json.loads(f.readline())['log']
+                for i in range(len(logs) - 1, -1, -1):
+                    if start <= first_id + i < end:
+                        items.append((first_id + i, self.decode(logs[i])))
+                if first_id <= start:
+                    break
+                pos -= 1
+        return items
             
     def get_portfolio(self):
-        return self.state
+        """
+        The latest published snapshot: constant size (only the recent history, as TradeRecords).
+        Read-only; never mutated after publication, so no locking is needed.
+        """
+        return self._view[0]
+        
+    def trade_log(self) -> list:
+        """Every record since the last reset, oldest first (from the journal)."""
+        page = self.history_page(limit=self._view[2])
+        return [item['record'] for item in reversed(page['items'])]
+        
+    def analytics(self) -> dict:
+        """Vectorized portfolio analytics over the full trade log (see trade_analytics)."""
+        return trade_analytics(self.trade_log())
 
     def reset(self):
+        with self._lock:
+            self._reset()
+            self._publish()
+
+    def _reset(self):
         self.state["balance"] = 10000.0
         self.state["cash"] = 10000.0
-        self.state["positions"] = {}
-        self.state["history"] = []
+        self.book.clear()
+        self.state["positions"] = self.book.positions
+        self.state["history"] = deque(maxlen=self.history_limit)
         self.state["score"] = 0
         self.state["level"] = "Novice (Risk Taker)"
         self.state["status"] = "ALIVE"
+        
+        # Start a fresh journal
+        self.close()
+        if self.persist:
+            open(self.journal_path, 'wb').close()
+        self._records = []
+        self.seq = 0
+        self.events = 0
+        self.generation += 1
+        self._index = None
+        self._committed = {k: self.state[k] for k in SCALAR_FIELDS}
+        self._touched = set()
+        self._logs = []
         self.save_state()
 
     def process_tick(self, market_data: list):
@@ -56,71 +344,86 @@ class SimulationEngine:
         Processes a 'tick' of market data decisions.
         1. Check Existing Positions (TP/SL).
         2. Open New Positions if Signal is Strong.
+        Returns the TradeRecords created this tick.
         """
+        with self._lock:
+            return self._process_tick(market_data)
+
+    def _process_tick(self, market_data: list):
         logs = []
+        book = self.book
         
-        # Create a map for quick lookup
-        market_map = {item['Ticker']: item for item in market_data}
+        # Columns of the tick
+        tickers = [item['Ticker'] for item in market_data]
+        price = np.array([item.get('Price') or 0 for item in market_data], dtype=np.float64)
+        has_quote = price > 0 # Missing / non-positive Price = no quote this tick
         
         # 1. Manage Existing Positions
-        active_tickers = list(self.state['positions'].keys())
-        for ticker in active_tickers:
-            if ticker not in market_map: continue
-            
-            position = self.state['positions'][ticker]
-            current_price = market_map[ticker]['Price']
-            
-            entry = position['avg_price']
-            qty = position['qty']
-            pnl_pct = (current_price - entry) / entry * 100
+        # Mark held tickers to this tick's price (last quote wins), then TP/SL on all of them at once;
+        # positions without a quote stay at cost and are not checked
+        exits = ()
+        if len(book):
+            quoted = book.mark(self._quoted_slots(tickers, has_quote), price)
+            pnl = book.pnl_pct(quoted)
+            take_profit = pnl >= 1.0 # Take Profit (+1%)
+            stop_loss = (pnl <= -0.5) & ~take_profit # Stop Loss (-0.5%)
+            exits = np.nonzero(take_profit | stop_loss)[0] # Indices into quoted
+            exits = exits[np.argsort(book.opened[quoted[exits]], kind='stable')]
+        
+        # Simple Exit Logic (Reinforcement Signal), in the order the positions were opened
+        for i in exits:
+            slot = quoted[i]
+            ticker = book.tickers[slot]
+            current_price = float(book.last_price[slot])
+            pnl_pct = float(pnl[i])
+            action, reward = ("SELL_TP", 1) if take_profit[i] else ("SELL_SL", -4)
             
-            # Simple Exit Logic (Reinforcement Signal)
-            action = None
-            reward = 0
+            # Execute Sell
+            closed = book.close(ticker)
+            qty = closed['qty']
+            self.state['cash'] += qty * current_price
+            self._touched.add(ticker)
             
-            # Take Profit (+1%)
-            if pnl_pct >= 1.0:
-                action = "SELL_TP"
-                reward = 1
-            # Stop Loss (-0.5%)
-            elif pnl_pct <= -0.5:
-                action = "SELL_SL"
-                reward = -4
+            # Update RL Score
+            self.state['score'] += reward
+            self.update_level()
             
-            if action:
-                # Execute Sell
-                proceeds = qty * current_price
-                self.state['cash'] += proceeds
-                del self.state['positions'][ticker]
-                
-                # Update RL Score
-                self.state['score'] += reward
-                self.update_level()
-                
-                # Log
-                log_entry = f"{action} {ticker} @ {current_price}. PnL: {pnl_pct:.2f}%. Reward: {reward} pts."
-                self.state['history'].insert(0, log_entry)
-                logs.append(log_entry)
+            # Log
+            record = TradeRecord(time.time(), action, ticker, qty, current_price,
+                                 level=self.state['level'], reward=reward, pnl_pct=pnl_pct,
+                                 entry_price=closed['avg_price'])
+            self.log(record)
+            logs.append(record)
         
         # 2. KeyLogic: Open New Positions
         # Only if we have cash and strict criteria
-        for item in market_data:
-            ticker = item['Ticker']
-            price = item.get('Price', 0)
-            
-            if ticker in self.state['positions']: continue # Already hold it
-            if price == 0: continue
-            
-            # --- RL AGENT LOGIC (Dynamic Risk) ---
-            # 1. Determine Threshold based on Level
-            # "Risk Taker" initially -> Becomes disciplined later.
-            threshold = 0.85 # Default
-            level = self.state['level']
-            
-            if "Novice" in level: threshold = 0.10 # Buy Everything (Learning Phase)
-            elif "Apprentice" in level: threshold = 0.40
-            elif "Pro" in level: threshold = 0.70
-            elif "Wolf" in level: threshold = 0.90
+        # --- RL AGENT LOGIC (Dynamic Risk) ---
+        # 1. Determine Threshold based on Level
+        # "Risk Taker" initially -> Becomes disciplined later.
+        threshold = 0.85 # Default
+        level = self.state['level']
+        
+        if "Novice" in level: threshold = 0.10 # Buy Everything (Learning Phase)
+        elif "Apprentice" in level: threshold = 0.40
+        elif "Pro" in level: threshold = 0.70
+        elif "Wolf" in level: threshold = 0.90
+        
+        # Allocate 20% of Portfolio (Aggressive)
+        allocation = self.state['balance'] * 0.20
+        buy_qty = np.trunc(np.divide(allocation, price, out=np.zeros_like(price), where=has_quote))
+        
+        # Only decisions that could clear the threshold (even with the volume boost below)
+        # and afford a share get their text fields read
+        confidence = np.array([item['Confidence'] for item in market_data], dtype=np.float64)
+        shortlist = np.nonzero((confidence + 0.10 >= threshold) & (buy_qty >= 1))[0]
+        
+        bought = False
+        for k in shortlist:
+            if self.state['cash'] <= allocation:
+                break # Cash only goes down: nothing further is affordable
+            item = market_data[k]
+            ticker = tickers[k]
+            if ticker in book: continue # Already hold it
             
             # 2. Educated Guessing (Boost Conf if Volume High)
             # Simulating "Reasoning"
@@ -134,31 +437,37 @@ class SimulationEngine:
                              "SNIPER" in item.get('Signal', ''))
                              
             if (adjusted_conf >= threshold) and is_buy_signal:
-                # Allocate 20% of Portfolio (Aggressive)
-                allocation = self.state['balance'] * 0.20
-                if self.state['cash'] > allocation:
-                    qty = int(allocation / price)
-                    if qty > 0:
-                        cost = qty * price
-                        self.state['cash'] -= cost
-                        self.state['positions'][ticker] = {
-                            "qty": qty,
-                            "avg_price": price
-                        }
-                        log_entry = f"BOUGHT {ticker} @ {price}. Conf: {adjusted_conf:.2f} (Risk: {level})"
-                        self.state['history'].insert(0, log_entry)
-                        logs.append(log_entry)
+                qty, entry_price = int(buy_qty[k]), float(price[k])
+                self.state['cash'] -= qty * entry_price
+                book.open(ticker, qty, entry_price)
+                bought = True
+                self._touched.add(ticker)
+                record = TradeRecord(time.time(), 'BUY', ticker, qty, entry_price,
+                                     confidence=adjusted_conf, level=level)
+                self.log(record)
+                logs.append(record)
 
-        self.state['balance'] = self.state['cash'] + sum([
-            pos['qty'] * market_map.get(t, {'Price': pos['avg_price']}).get('Price', pos['avg_price']) 
-            for t, pos in self.state['positions'].items()
-        ])
+        # New positions are marked at the tick's last quote too (a duplicate may follow the entry quote)
+        if bought:
+            book.mark(self._quoted_slots(tickers, has_quote), price)
+        self.state['balance'] = self.state['cash'] + book.market_value()
         
-        self.save_state()
-        self.check_survival() # Check if we survived this tick
+        self._check_survival() # Check if we survived this tick
+        self.commit() # One journal line for the whole tick
         return logs
 
+    def _quoted_slots(self, tickers: list, has_quote: np.ndarray) -> np.ndarray:
+        """Book slot per decision, -1 where the ticker isn't held or has no quote."""
+        slots = self.book.lookup(tickers)
+        slots[~has_quote] = -1
+        return slots
+
     def check_survival(self):
+        with self._lock:
+            self._check_survival()
+            self.commit()
+
+    def _check_survival(self):
         """
         The Perma-Death Mechanic.
         If Balance <= 0:
@@ -170,14 +479,14 @@ class SimulationEngine:
             
             if "Novice" in current_level:
                 self.state['status'] = "DEAD" # Frontend will see this and Unlock
-                self.state['history'].insert(0, "☠️ ACCOUNT BLOWN! GAME OVER. ☠️")
+                self.log(TradeRecord(time.time(), 'BLOWN', level=current_level))
                 # Reset Score but keep history for shame
                 self.state['score'] = 0
             else:
                 # Second Chance (Demotion)
                 self.state['balance'] = 10000.0 # Refill
                 self.state['cash'] = 10000.0
-                self.state['history'].insert(0, "⚠️ MARGIN CALL! Level Lost. Balance Reset.")
+                self.log(TradeRecord(time.time(), 'MARGIN_CALL', level=current_level))
                 
                 # Demote Logic
                 if "Wolf" in current_level: self.state['level'] = "Pro Trader"
@@ -187,8 +496,6 @@ class SimulationEngine:
                 
                 self.state['score'] = max(0, self.state['score'] - 50) # Big Penalty
 
-        self.save_state()
-
     def update_level(self):
         score = self.state['score']
         # Level Up Logic
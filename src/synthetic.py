@@ -0,0 +1,209 @@
+import logging
+import math
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Iterator, List, Optional
+import numpy as np
+import pandas as pd
+from .panel import MarketPanel
+from .data_loader import MVPDataLoader
+from .data_loader_intraday import IntradayDataLoader
+
+logger = logging.getLogger('Synthetic')
+
+TRADING_DAYS = 252
+SESSION_OPEN = pd.Timedelta(hours=9, minutes=15) # NSE cash session 09:15 - 15:30
+SESSION_MINUTES = 375
+TIMEZONE = 'Asia/Kolkata' # yfinance returns NSE intraday bars in exchange time
+INTERVAL_MINUTES = {'1m': 1, '5m': 5, '15m': 15, '30m': 30, '1h': 60}
+
+@dataclass(frozen=True)
+class Regime:
+    """Market regime: annualized drift / volatility, and the daily probability of staying in it."""
+    name: str
+    drift: float
+    vol: float
+    persistence: float
+
+REGIMES = (
+    Regime('calm', drift=0.12, vol=0.14, persistence=0.985),
+    Regime('volatile', drift=-0.15, vol=0.40, persistence=0.95),
+)
+
+def ticker_names(n: int) -> List[str]:
+    return [f"SYN{i:05d}.NS" for i in range(n)]
+
+class SyntheticMarket:
+    """
+    Seeded, regime-switching GBM market for scale and load tests (no network).
+
+    - A Markov chain over REGIMES (one state per trading day) drives a common market factor;
+      each ticker adds its own beta, idiosyncratic volatility, price level and volume level.
+    - Realism knobs: overnight gaps (with occasional large jumps), volume that rises with
+      |return| and follows an intraday U-shape, missing bars (halts) and late listings.
+    - interval '1d' gives business days; '15m' etc. give NSE sessions in exchange time.
+
+    Every ticker is generated from its own seed (seed, crc32(ticker)), so a ticker's bars do not
+    depend on which other tickers are generated or on the chunk size. Only O(bars) shared state
+    is held; panels are built on demand, whole (panel) or in bounded chunks (chunks).
+    """
+    def __init__(self, tickers=10_000, start: str = '2019-01-01', end: str = None, interval: str = '1d',
+                 seed: int = 42, regimes=REGIMES, gap_prob: float = 0.01, gap_size: float = 0.05,
+                 missing_prob: float = 0.002, listing_frac: float = 0.10):
+        self.tickers = ticker_names(tickers) if isinstance(tickers, int) else list(tickers)
+        self.interval = interval
+        self.seed = seed
+        self.regimes = regimes
+        self.gap_prob = gap_prob
+        self.gap_size = gap_size
+        self.missing_prob = missing_prob
+        self.listing_frac = listing_frac
+
+        # 1. Calendar
+        days = pd.bdate_range(start, end or pd.Timestamp.today().normalize())
+        if interval == '1d':
+            self.index = days
+            self.bars_per_session = 1
+        elif interval in INTERVAL_MINUTES:
+            minutes = INTERVAL_MINUTES[interval]
+            self.bars_per_session = math.ceil(SESSION_MINUTES / minutes)
+            offsets = SESSION_OPEN + pd.to_timedelta(np.arange(self.bars_per_session) * minutes, unit='min')
+            stamps = (days.values[:, None] + offsets.values[None, :]).ravel()
+            self.index = pd.DatetimeIndex(stamps).tz_localize(TIMEZONE)
+        else:
+            raise ValueError(f"Unsupported interval {interval}")
+        n_bars = len(self.index)
+        session_bar = np.arange(n_bars) % self.bars_per_session
+        self.session_open = session_bar == 0
+
+        # 2. Regime path (per day) -> per-bar drift / volatility
+        rng = np.random.default_rng([seed, 0])
+        states = np.empty(len(days), dtype=np.int64)
+        state, stay = 0, rng.random(len(days))
+        jump = rng.integers(1, len(regimes), len(days)) if len(regimes) > 1 else np.zeros(len(days), dtype=np.int64)
+        for d in range(len(days)):
+            if stay[d] > regimes[state].persistence:
+                state = (state + jump[d]) % len(regimes)
+            states[d] = state
+        self.regime = np.repeat(states, self.bars_per_session)
+        bars_per_year = TRADING_DAYS * self.bars_per_session
+        self.drift = np.array([r.drift for r in regimes])[self.regime] / bars_per_year
+        self.vol = np.array([r.vol for r in regimes])[self.regime] / np.sqrt(bars_per_year)
+
+        # 3. Common market factor; intraday volume profile (U-shape: busy open and close)
+        self.market = self.drift + 0.6 * self.vol * rng.standard_normal(n_bars)
+        u = session_bar / max(self.bars_per_session - 1, 1)
+        self.volume_profile = 0.6 + 1.6 * (2 * u - 1) ** 2 if self.bars_per_session > 1 else np.ones(n_bars)
+
+    def __len__(self):
+        return len(self.tickers)
+
+    def nbytes(self, n_tickers: int = None) -> int:
+        """Size of the values array of a panel over n_tickers (default: the whole universe)."""
+        n = len(self.tickers) if n_tickers is None else n_tickers
+        return len(MarketPanel.FIELDS) * len(self.index) * n * 8
+
+    def ticker_values(self, ticker: str) -> np.ndarray:
+        """(field x time) OHLCV for one ticker; NaN where it has no bar (halted / not yet listed)."""
+        n_bars = len(self.index)
+        rng = np.random.default_rng([self.seed, zlib.crc32(ticker.encode())])
+        beta = rng.uniform(0.5, 1.5)
+        idio = rng.lognormal(0.0, 0.3) * 0.8 # Idiosyncratic vol, relative to the regime's
+        price = rng.lognormal(np.log(200), 1.0)
+        base_volume = rng.lognormal(12, 1.2) / self.bars_per_session
+        listed = rng.integers(0, n_bars // 2) if rng.random() < self.listing_frac and n_bars > 1 else 0
+        z = rng.standard_normal((5, n_bars))
+        u = rng.random((2, n_bars))
+
+        # 1. Returns: market beta + idiosyncratic; gaps only at the session open
+        ret = beta * self.market + idio * self.vol * z[0]
+        gap_vol = np.where(u[0] < self.gap_prob, self.gap_size, 0.5 * self.vol)
+        gap = np.where(self.session_open, gap_vol * z[1], 0.0)
+        log_close = np.log(price) + np.cumsum(ret + gap)
+
+        # 2. OHLC: open = close before the intrabar move; wicks scale with volatility
+        close = np.exp(log_close)
+        open_ = np.exp(log_close - ret)
+        wick = 0.5 * self.vol * (beta + idio)
+        high = np.maximum(open_, close) * np.exp(np.abs(z[2]) * wick)
+        low = np.minimum(open_, close) * np.exp(-np.abs(z[3]) * wick)
+
+        # 3. Volume: lognormal noise, more on big moves, intraday U-shape
+        shock = np.minimum(np.abs(ret + gap) / (self.vol * (beta + idio)), 5.0)
+        volume = np.round(base_volume * self.volume_profile * np.exp(0.4 * z[4] + 0.3 * shock))
+
+        values = np.stack([open_, high, low, close, volume])
+        values[:, u[1] < self.missing_prob] = np.nan
+        values[:, :listed] = np.nan
+        return values
+
+    def ticker_frame(self, ticker: str) -> pd.DataFrame:
+        """One ticker as a download would return it: OHLCV rows it actually traded."""
+        df = pd.DataFrame(self.ticker_values(ticker).T, index=self.index, columns=MarketPanel.FIELDS)
+        return df.dropna()
+
+    def panel(self, tickers: List[str] = None) -> MarketPanel:
+        """
+        MarketPanel over `tickers` (default: the whole universe), forward-filled like fetch_panel.
+        Needs nbytes(len(tickers)) of memory; use chunks() for universes that don't fit.
+        """
+        tickers = self.tickers if tickers is None else list(tickers)
+        values = np.empty((len(MarketPanel.FIELDS), len(self.index), len(tickers)))
+        for j, t in enumerate(tickers):
+            values[:, :, j] = self.ticker_values(t)
+        valid = ~np.isnan(values[MarketPanel.FIELDS.index('Close')])
+        return MarketPanel(MarketPanel._ffill(values), self.index, tickers, valid=valid)
+
+    def chunks(self, chunk_size: int = 500, tickers: List[str] = None) -> Iterator[MarketPanel]:
+        """
+        Yields panels of up to chunk_size tickers. Peak memory is a few x nbytes(chunk_size)
+        (forward-fill copies, plus the previous chunk while the caller still holds it).
+        """
+        tickers = self.tickers if tickers is None else list(tickers)
+        for i in range(0, len(tickers), chunk_size):
+            yield self.panel(tickers[i:i + chunk_size])
+
+class SyntheticDataLoader(MVPDataLoader):
+    """MVPDataLoader over a SyntheticMarket: fetch_panel / get_data_splits without downloads."""
+    def __init__(self, market: SyntheticMarket, tickers: list = None, **kwargs):
+        super().__init__(tickers=tickers or market.tickers, **kwargs)
+        self.market = market
+
+    def fetch_panel(self) -> MarketPanel:
+        return self.market.panel(self.tickers)
+
+    def fetch_batch_data(self) -> pd.DataFrame:
+        """(Ticker, Field) MultiIndex frame, forward-filled like the batch download."""
+        panel = self.fetch_panel()
+        columns = pd.MultiIndex.from_product([panel.tickers, panel.fields])
+        wide = panel.values.transpose(1, 2, 0).reshape(len(panel.index), -1)
+        return pd.DataFrame(wide, index=panel.index, columns=columns)
+
+class SyntheticIntradayLoader(IntradayDataLoader):
+    """IntradayDataLoader over an intraday SyntheticMarket (one ticker generated per fetch)."""
+    def __init__(self, market: SyntheticMarket):
+        super().__init__()
+        self.market = market
+
+    def fetch_data(self, ticker: str, interval: str = '15m', period: str = '59d') -> Optional[pd.DataFrame]:
+        if interval != self.market.interval:
+            logger.warning(f"Synthetic market is {self.market.interval}, not {interval}.")
+        df = self.market.ticker_frame(ticker)
+        if period.endswith('d'):
+            df = df[df.index.normalize() > df.index[-1].normalize() - pd.offsets.BDay(int(period[:-1]))]
+        if len(df) < 50:
+            return None # Same contract as a short download
+        return df
+
+if __name__ == "__main__":
+    # Stress sanity check: a 10k ticker daily universe, generated in bounded chunks
+    market = SyntheticMarket(10_000)
+    logger.info(f"{len(market)} tickers x {len(market.index)} bars "
+                f"({market.nbytes() / 2**30:.1f} GB as one panel)")
+    start, bars = time.perf_counter(), 0
+    for panel in market.chunks(1000):
+        bars += int(panel.valid.sum())
+    seconds = time.perf_counter() - start
+    logger.info(f"Generated {bars:,} bars in {seconds:.1f}s ({bars / seconds:,.0f} bars/s, "
+                f"chunks of {market.nbytes(1000) / 2**20:.0f} MB)")
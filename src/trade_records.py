@@ -0,0 +1,110 @@
+import numpy as np
+from dataclasses import dataclass, fields
+from typing import List
+
+SIDES = ['BUY', 'SELL_TP', 'SELL_SL', 'BLOWN', 'MARGIN_CALL']
+
+@dataclass(slots=True, frozen=True)
+class TradeRecord:
+    """
+    One SimulationEngine event (trade or account notice). Immutable, so snapshots can share it.
+    Stored as-is in memory and as a compact row (list) in the journal; rendered to text only for display.
+    """
+    time: float # Epoch seconds
+    side: str # One of SIDES
+    ticker: str = ''
+    qty: int = 0
+    price: float = 0.0
+    confidence: float = 0.0
+    level: str = ''
+    reward: int = 0
+    pnl_pct: float = 0.0 # Sells only
+    entry_price: float = 0.0 # Sells only: avg price of the closed position (0 in older journals)
+
+    def render(self) -> str:
+        """The human-readable log line shown in the dashboard."""
+        if self.side == 'BUY':
+            return f"BOUGHT {self.ticker} @ {self.price}. Conf: {self.confidence:.2f} (Risk: {self.level})"
+        if self.side in ('SELL_TP', 'SELL_SL'):
+            return f"{self.side} {self.ticker} @ {self.price}. PnL: {self.pnl_pct:.2f}%. Reward: {self.reward} pts."
+        if self.side == 'BLOWN':
+            return "☠️ ACCOUNT BLOWN! GAME OVER. ☠️"
+        if self.side == 'MARGIN_CALL':
+            return "⚠️ MARGIN CALL! Level Lost. Balance Reset."
+        return f"{self.side} {self.ticker}"
+
+    def to_row(self) -> list:
+        return [getattr(self, f) for f in FIELDS]
+
+    @classmethod
+    def from_row(cls, row) -> 'TradeRecord':
+        return cls(*row)
+
+FIELDS = [f.name for f in fields(TradeRecord)]
+
+def render(entry) -> str:
+    """Text for a history entry (TradeRecord, or a plain string from pre-record state files)."""
+    return entry if isinstance(entry, str) else entry.render()
+
+def to_array(records: List[TradeRecord]):
+    """
+    Packs records into a NumPy structured array for vectorized analytics.
+    Tickers and levels become int codes; returns (array, tickers, levels).
+    """
+    records = [r for r in records if isinstance(r, TradeRecord)]
+    tickers, ticker_id = np.unique(np.array([r.ticker for r in records], dtype=object).astype(str), return_inverse=True)
+    levels, level_id = np.unique(np.array([r.level for r in records], dtype=object).astype(str), return_inverse=True)
+    dtype = [('time', 'f8'), ('side', 'i1'), ('ticker', 'i4'), ('qty', 'i8'), ('price', 'f8'),
+             ('confidence', 'f4'), ('level', 'i2'), ('reward', 'i4'), ('pnl_pct', 'f8'),
+             ('entry_price', 'f8')]
+    arr = np.empty(len(records), dtype=dtype)
+    side_id = {s: i for i, s in enumerate(SIDES)}
+    arr['time'] = [r.time for r in records]
+    arr['side'] = [side_id.get(r.side, -1) for r in records]
+    arr['ticker'] = ticker_id
+    arr['qty'] = [r.qty for r in records]
+    arr['price'] = [r.price for r in records]
+    arr['confidence'] = [r.confidence for r in records]
+    arr['level'] = level_id
+    arr['reward'] = [r.reward for r in records]
+    arr['pnl_pct'] = [r.pnl_pct for r in records]
+    arr['entry_price'] = [r.entry_price for r in records]
+    return arr, list(tickers), list(levels)
+
+def trade_analytics(records: List[TradeRecord]) -> dict:
+    """
+    Portfolio analytics over a trade log (any order; sorted by time here), all vectorized:
+    - trades / buys / sells, hit rate (take-profits / closed trades), total reward
+    - realized P&L overall and per ticker
+    - exposure (cost basis of open positions) after every event
+    """
+    arr, tickers, _ = to_array(records)
+    arr = arr[np.argsort(arr['time'], kind='stable')]
+    buy = arr['side'] == SIDES.index('BUY')
+    tp = arr['side'] == SIDES.index('SELL_TP')
+    sell = tp | (arr['side'] == SIDES.index('SELL_SL'))
+
+    # Sells carry qty, exit price and entry price -> cost basis and realized P&L.
+    # Sells journaled before entry_price existed fall back to exit price / (1 + pnl_pct)
+    # (0 when that is undefined, i.e. a -100% exit).
+    notional = arr['qty'] * arr['price']
+    growth = 1 + arr['pnl_pct'] / 100
+    legacy_cost = np.divide(notional, growth, out=np.zeros(len(arr)), where=growth != 0)
+    entry_cost = np.where(sell, np.where(arr['entry_price'] > 0, arr['qty'] * arr['entry_price'], legacy_cost), 0.0)
+    realized = np.where(sell, notional - entry_cost, 0.0)
+    pnl_by_ticker = np.bincount(arr['ticker'], weights=realized, minlength=len(tickers))
+
+    # Exposure: + cost on buys, - cost basis on sells
+    exposure = np.cumsum(np.where(buy, notional, 0.0) - entry_cost)
+
+    n_sells = int(sell.sum())
+    return {
+        'trades': len(arr),
+        'buys': int(buy.sum()),
+        'sells': n_sells,
+        'hit_rate': float(tp.sum() / n_sells) if n_sells else 0.0,
+        'total_reward': int(arr['reward'].sum()),
+        'realized_pnl': float(realized.sum()),
+        'pnl_by_ticker': {t: float(p) for t, p in zip(tickers, pnl_by_ticker) if t},
+        'exposure': {'time': arr['time'], 'value': exposure}
+    }
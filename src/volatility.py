@@ -0,0 +1,123 @@
+import warnings
+import numpy as np
+import pandas as pd
+
+TRADING_DAYS = 252
+
+def rolling_hv(close: np.ndarray, window: int = 20) -> np.ndarray:
+    """
+    Annualized rolling volatility (in %) of log returns.
+    close: (time,) or (time x ticker) array. Returns the same shape, NaN until `window` returns exist.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    log_ret = np.full(close.shape, np.nan)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        log_ret[1:] = np.log(close[1:] / close[:-1])
+    # pandas' rolling std is column-vectorized and O(time) per column
+    hv = pd.DataFrame(log_ret.reshape(len(close), -1)).rolling(window=window).std().to_numpy()
+    return hv.reshape(close.shape) * np.sqrt(TRADING_DAYS) * 100
+
+def hv_rank_snapshot(close: np.ndarray, window: int = 20, lookback: int = TRADING_DAYS, min_history: int = 260) -> dict:
+    """
+    HV Rank (0-100) at the last bar for every column of a (time x ticker) close array.
+    Rank = % of the last `lookback` HV values strictly below the current HV.
+
+    Only the trailing lookback + window rows are touched. Columns with fewer than
+    `min_history` bars (counted from their first valid close) come back as NaN.
+    Returns {'Current_HV', 'HV_Rank', 'High_HV', 'Low_HV', 'Bars'} arrays of shape (ticker,).
+    """
+    close = np.asarray(close, dtype=np.float64)
+    if close.ndim == 1:
+        close = close[:, None]
+    n_time = len(close)
+
+    # Bars of history per ticker (leading NaNs = not listed yet)
+    listed = ~np.isnan(close)
+    bars = np.where(listed.any(axis=0), n_time - listed.argmax(axis=0), 0)
+
+    hv = rolling_hv(close[-(lookback + window):], window)[-lookback:]
+    current = hv[-1]
+    # NaN HVs inside the window count as "not below" (same as the per-ticker pandas version)
+    rank = (hv < current).mean(axis=0) * 100
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning) # All-NaN columns (unlisted tickers)
+        high, low = np.nanmax(hv, axis=0), np.nanmin(hv, axis=0)
+
+    short = bars < min_history
+    return {
+        'Current_HV': np.where(short, np.nan, current),
+        'HV_Rank': np.where(short, np.nan, rank),
+        'High_HV': np.where(short, np.nan, high),
+        'Low_HV': np.where(short, np.nan, low),
+        'Bars': bars
+    }
+
+def rolling_percentile_rank(values: np.ndarray, window: int) -> np.ndarray:
+    """
+    Rolling percentile rank (0-100): % of the last `window` values (current included)
+    strictly below the current value. NaNs inside the window count as "not below".
+    values: (time,) or (time x ticker). NaN for the first window - 1 bars and where the value is NaN.
+
+    Each column's values are compressed to sorted positions and counted with a Fenwick
+    (binary indexed) tree as the window slides: O(log n) per insert/remove/query instead
+    of O(window) per bar, vectorized across columns.
+    """
+    x = np.asarray(values, dtype=np.float64)
+    flat = x.reshape(len(x), -1)
+    n_time, n_cols = flat.shape
+    out = np.full(flat.shape, np.nan)
+    if n_time < window:
+        return out.reshape(x.shape)
+
+    # 1. Compress: pos = number of values in the column strictly below (ties share a pos)
+    valid = ~np.isnan(flat)
+    ordered = np.sort(flat, axis=0) # NaN last
+    pos = np.empty(flat.shape, dtype=np.int64)
+    for j in range(n_cols):
+        pos[:, j] = np.searchsorted(ordered[:, j], flat[:, j], side='left')
+    delta = valid.astype(np.int32) # NaNs are "inserted" with weight 0
+
+    # 2. Fenwick tree per column (1-based; slot n_time + 1 is a sink for finished walks)
+    sink = n_time + 1
+    levels = n_time.bit_length() + 1
+    tree = np.zeros((n_cols, n_time + 2), dtype=np.int32)
+    cols = np.arange(n_cols)
+
+    def update(i, d):
+        for _ in range(levels):
+            tree[cols, i] += d
+            i = i + (i & -i)
+            i[i > n_time] = sink
+
+    def count_below(i):
+        total = np.zeros(n_cols, dtype=np.int64)
+        for _ in range(levels):
+            total += tree[cols, i] # tree[:, 0] stays 0
+            i = i - (i & -i)
+        return total
+
+    # 3. Slide
+    for t in range(n_time):
+        update(pos[t] + 1, delta[t])
+        if t >= window:
+            update(pos[t - window] + 1, -delta[t - window])
+        if t >= window - 1:
+            below = count_below(pos[t].copy())
+            out[t] = np.where(valid[t], below * (100.0 / window), np.nan)
+    return out.reshape(x.shape)
+
+def hv_rank_series(close: np.ndarray, window: int = 20, lookback: int = TRADING_DAYS, min_history: int = 260) -> np.ndarray:
+    """
+    Full-history HV Rank: at every bar, the hv_rank_snapshot value as of that bar.
+    close: (time,) or (time x ticker). NaN until a ticker has `min_history` bars.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    flat = close.reshape(len(close), -1)
+    ranks = rolling_percentile_rank(rolling_hv(flat, window), lookback)
+
+    # Bars of history as of each row (0 before listing)
+    listed = ~np.isnan(flat)
+    first = np.where(listed.any(axis=0), listed.argmax(axis=0), len(flat))
+    bars = np.arange(len(flat))[:, None] - first[None, :] + 1
+    ranks[bars < min_history] = np.nan
+    return ranks.reshape(close.shape)
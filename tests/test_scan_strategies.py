@@ -0,0 +1,55 @@
+import numpy as np
+import pandas as pd
+from scan_strategies import simulate_managed_trades, settle_with_intraday
+
+class FakeIntradayLoader:
+    """Serves fixed intraday bars and counts fetches."""
+    def __init__(self, bars):
+        self.bars = bars
+        self.fetches = 0
+
+    def get_cached(self, ticker, interval='15m', period='59d'):
+        self.fetches += 1
+        return self.bars
+
+def daily_frame():
+    # Entries at Close 100; the next day's bar touches both TP (102) and SL (99)
+    index = pd.bdate_range('2024-06-03', periods=4)
+    return pd.DataFrame({
+        'Open': [100.0, 100.0, 100.0, 100.0],
+        'High': [100.5, 103.0, 103.0, 100.5],
+        'Low': [99.5, 98.0, 98.0, 99.5],
+        'Close': [100.0, 100.0, 100.0, 100.0]
+    }, index=index)
+
+def intraday_frame(day, highs, lows):
+    index = pd.date_range(f"{day} 09:15", periods=len(highs), freq='15min', tz='Asia/Kolkata')
+    return pd.DataFrame({'Open': 100.0, 'High': highs, 'Low': lows, 'Close': 100.0}, index=index)
+
+def test_tp_first_day_flips_to_win():
+    df = daily_frame()
+    trades = simulate_managed_trades(df)
+    candidates = trades['Ambiguous'] & trades['Valid']
+    assert candidates.sum() == 2 and (trades.loc[candidates, 'Outcome'] == -1).all()
+
+    # Intraday bars cover only 2024-06-04 (exit of the first trade): TP is hit before SL
+    bars = intraday_frame('2024-06-04', highs=[100.5, 102.5, 101.0], lows=[99.5, 100.0, 98.5])
+    loader = FakeIntradayLoader(bars)
+    result = settle_with_intraday('TEST.NS', df, trades, candidates, loader, today='2024-06-10')
+
+    assert loader.fetches == 1
+    assert result == {'lookups': 1, 'tp_first': 1, 'unresolved': 1}
+    assert trades['Outcome'].iloc[0] == 1 and np.isclose(trades['Return'].iloc[0], 0.02)
+    # 2024-06-05 has no intraday bars: stays a loss
+    assert trades['Outcome'].iloc[1] == -1 and np.isclose(trades['Return'].iloc[1], -0.01)
+
+def test_no_fetch_outside_intraday_window():
+    df = daily_frame()
+    trades = simulate_managed_trades(df)
+    candidates = trades['Ambiguous'] & trades['Valid']
+    loader = FakeIntradayLoader(None)
+    result = settle_with_intraday('TEST.NS', df, trades, candidates, loader, today='2025-06-10')
+
+    assert loader.fetches == 0
+    assert result == {'lookups': 0, 'tp_first': 0, 'unresolved': 2}
+    assert (trades.loc[candidates, 'Outcome'] == -1).all()